@@ -0,0 +1,120 @@
+import math
+import numpy as np
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import get_box_pairs, get_boxes_bounds
+
+MAX_DISTANCE = 32
+PAGE_WIDTH = 900
+SIZES = [50, 200, 800]
+
+
+def get_box_bounds(box):
+	min_x = min(p[0] for p in box)
+	min_y = min(p[1] for p in box)
+	max_x = max(p[0] for p in box)
+	max_y = max(p[1] for p in box)
+	return min_x, min_y, max_x, max_y
+
+
+def get_box_distance(box1, box2):
+	min_x1, min_y1, max_x1, max_y1 = get_box_bounds(box1)
+	min_x2, min_y2, max_x2, max_y2 = get_box_bounds(box2)
+	dx = max(min_x1 - max_x2, min_x2 - max_x1, 0)
+	dy = max(min_y1 - max_y2, min_y2 - max_y1, 0)
+	return math.sqrt(dx**2 + dy**2)
+
+
+def get_pairwise_pairs(boxes, max_distance):
+	pairs = set()
+	for i in range(len(boxes)):
+		for j in range(i + 1, len(boxes)):
+			if get_box_distance(boxes[i], boxes[j]) <= max_distance:
+				pairs.add((i, j))
+	return pairs
+
+
+def create_box(x, y, w, h):
+	return [[x, y], [x + w, y], [x + w, y + h], [x, y + h]]
+
+
+def get_scattered_layout(count, rng):
+	height = count * 60
+	return [
+		create_box(
+			rng.randint(0, PAGE_WIDTH - 200),
+			rng.randint(0, height),
+			rng.randint(40, 200),
+			rng.randint(16, 40),
+		)
+		for _ in range(count)
+	]
+
+
+def get_bubble_layout(count, rng):
+	boxes = []
+	y = 0
+	while len(boxes) < count:
+		x = rng.randint(0, PAGE_WIDTH - 300)
+		for _ in range(min(rng.randint(2, 6), count - len(boxes))):
+			boxes.append(
+				create_box(x + rng.randint(-10, 10), y, rng.randint(120, 280), 24)
+			)
+			y += 24 + rng.randint(2, 12)
+		y += rng.randint(MAX_DISTANCE + 1, 200)
+	rng.shuffle(boxes)
+	return boxes
+
+
+def get_chain_layout(count, rng):
+	boxes = []
+	y = 0
+	for _ in range(count):
+		boxes.append(create_box(rng.randint(0, 40), y, 200, 20))
+		y += 20 + rng.randint(0, MAX_DISTANCE)
+	return boxes
+
+
+def get_layouts(count, seed):
+	rng = random.Random(seed)
+	return {
+		"scattered": get_scattered_layout(count, rng),
+		"bubbles": get_bubble_layout(count, rng),
+		"bubbles_float32": np.array(
+			get_bubble_layout(count, rng), dtype=np.float32
+		)
+		+ np.float32(0.5),
+		"chain": get_chain_layout(count, rng),
+	}
+
+
+def main():
+	for count in SIZES:
+		for name, boxes in get_layouts(count, count).items():
+			start_time = time.perf_counter()
+			expected_bounds = np.array([get_box_bounds(box) for box in boxes])
+			expected_pairs = get_pairwise_pairs(boxes, MAX_DISTANCE)
+			old_time = time.perf_counter() - start_time
+			start_time = time.perf_counter()
+			bounds = get_boxes_bounds(boxes)
+			pairs = {
+				(min(i, j), max(i, j))
+				for i, j in zip(*get_box_pairs(bounds, MAX_DISTANCE))
+			}
+			new_time = time.perf_counter() - start_time
+			assert np.array_equal(bounds, expected_bounds), (name, count)
+			assert pairs == expected_pairs, (name, count)
+			print(
+				f"{name:>16} {count:>5} boxes {len(pairs):>6} pairs "
+				f"pairwise {old_time * 1000:9.2f} ms "
+				f"sweep {new_time * 1000:8.2f} ms"
+			)
+
+
+if __name__ == "__main__":
+	main()
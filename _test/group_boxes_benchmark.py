@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from box_pairs_benchmark import MAX_DISTANCE, SIZES, get_box_distance, get_layouts
+from main import get_boxes_bounds, group_boxes
+
+
+def collect_connected_nodes(adj_list, current, node, visited):
+	visited[node] = True
+	current.append(node)
+	for neighbor in adj_list[node]:
+		if not visited[neighbor]:
+			collect_connected_nodes(adj_list, current, neighbor, visited)
+
+
+def group_boxes_dfs(boxes, max_distance):
+	count = len(boxes)
+	if count == 0:
+		return []
+	adj_list = [[] for _ in range(count)]
+	for i in range(count):
+		for j in range(i + 1, count):
+			if get_box_distance(boxes[i], boxes[j]) <= max_distance:
+				adj_list[i].append(j)
+				adj_list[j].append(i)
+	visited = [False] * count
+	groups = []
+	for i in range(count):
+		if not visited[i]:
+			current = []
+			collect_connected_nodes(adj_list, current, i, visited)
+			groups.append(current)
+	return groups
+
+
+def main():
+	sys.setrecursionlimit(10000)
+	for count in SIZES:
+		for name, boxes in get_layouts(count, count).items():
+			start_time = time.perf_counter()
+			expected = group_boxes_dfs(boxes, MAX_DISTANCE)
+			old_time = time.perf_counter() - start_time
+			start_time = time.perf_counter()
+			groups = group_boxes(get_boxes_bounds(boxes), MAX_DISTANCE)
+			new_time = time.perf_counter() - start_time
+			assert [sorted(group) for group in groups] == [
+				sorted(group) for group in expected
+			], (name, count)
+			print(
+				f"{name:>16} {count:>5} boxes {len(groups):>5} groups "
+				f"dfs {old_time * 1000:9.2f} ms "
+				f"union-find {new_time * 1000:8.2f} ms"
+			)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,108 @@
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from box_pairs_benchmark import MAX_DISTANCE, PAGE_WIDTH, SIZES, get_layouts
+from main import get_bounds_and_centers, get_boxes_bounds, group_boxes, order_boxes
+
+MARGIN = 16
+READING_DIRECTIONS = ["rtl", "ltr"]
+
+
+def get_priority(corner_dist, y_diff):
+	return (y_diff * 3) + corner_dist
+
+
+def order_boxes_sorted(bounds, centers, reading_direction, width):
+	if not centers:
+		return []
+	corner_x = 0 if reading_direction == "ltr" else width
+	ranking = []
+	for i, center in enumerate(centers):
+		corner_dist = math.sqrt((corner_x - center[0]) ** 2 + center[1] ** 2)
+		y_pos = bounds[i][1]
+		ranking.append((i, corner_dist, y_pos))
+	ranking.sort(key=lambda x: x[1])
+	order = [ranking[0][0]]
+	prev_y = bounds[ranking[0][0]][1]
+	unprocessed = ranking[1:]
+	while unprocessed:
+		scores = []
+		for i, corner_dist, y_pos in unprocessed:
+			y_diff = abs(y_pos - prev_y)
+			score = get_priority(corner_dist, y_diff)
+			scores.append((i, score))
+		scores.sort(key=lambda x: x[1])
+		next_index = scores[0][0]
+		order.append(next_index)
+		prev_y = bounds[next_index][1]
+		unprocessed = [(i, d, y) for i, d, y in unprocessed if i != next_index]
+	return order
+
+
+def create_fixture(points):
+	bounds = [(x - 20, y, x + 20, y + 20) for x, _, y in points]
+	centers = [(x, center_y) for x, center_y, _ in points]
+	return bounds, centers
+
+
+def mirror_fixture(bounds, centers):
+	return (
+		[(PAGE_WIDTH - x1, y0, PAGE_WIDTH - x0, y1) for x0, y0, x1, y1 in bounds],
+		[(PAGE_WIDTH - x, y) for x, y in centers],
+	)
+
+
+def get_fixtures():
+	fixtures = {
+		"corner_tie": create_fixture(
+			[(870, 40, 0), (860, 30, 0), (500, 400, 300), (100, 600, 500)]
+		),
+		"score_tie": create_fixture(
+			[(870, 40, 0), (840, 80, 10), (822, 104, 0), (300, 300, 200)]
+		),
+		"duplicates": create_fixture(
+			[(600, 200, 180), (600, 200, 180), (300, 200, 180), (600, 200, 180)]
+		),
+		"row": create_fixture([(x, 100, 80) for x in range(100, 900, 100)]),
+		"grid": create_fixture(
+			[(x, y, y - 10) for y in range(50, 650, 150) for x in range(150, 900, 300)]
+		),
+		"empty": ([], []),
+	}
+	for name in list(fixtures):
+		fixtures[f"{name}_mirrored"] = mirror_fixture(*fixtures[name])
+	for count in SIZES:
+		for name, boxes in get_layouts(count, count).items():
+			box_bounds = get_boxes_bounds(boxes)
+			groups = group_boxes(box_bounds, MAX_DISTANCE)
+			fixtures[f"{name}_{count}"] = get_bounds_and_centers(
+				box_bounds, groups, MARGIN
+			)
+	return fixtures
+
+
+def main():
+	for name, (bounds, centers) in get_fixtures().items():
+		for reading_direction in READING_DIRECTIONS:
+			start_time = time.perf_counter()
+			expected = order_boxes_sorted(
+				bounds, centers, reading_direction, PAGE_WIDTH
+			)
+			old_time = time.perf_counter() - start_time
+			start_time = time.perf_counter()
+			order = order_boxes(bounds, centers, reading_direction, PAGE_WIDTH)
+			new_time = time.perf_counter() - start_time
+			assert order == expected, (name, reading_direction, order, expected)
+			print(
+				f"{name:>24} {reading_direction} {len(centers):>5} bubbles "
+				f"sorted {old_time * 1000:9.2f} ms "
+				f"argmin {new_time * 1000:8.2f} ms"
+			)
+
+
+if __name__ == "__main__":
+	main()
@@ -6,9 +6,8 @@ DIRS = {
 	"image_audio_resized": "image_audio_resized",
 	"image_boxed": "image_boxed",
 	"image_crops": "image_crops",
-	"image_durations": "image_durations",
-	"image_gaps": "image_gaps",
 	"image_grouped": "image_grouped",
+	"image_regions": "image_regions",
 	"image_resized": "image_resized",
 	"image_resized_fit": "image_resized_fit",
 	"image_resized_fit_fade": "image_resized_fit_fade",
@@ -16,6 +15,7 @@ DIRS = {
 	"merge": "merge",
 	"render": "render",
 	"temp": "temp",
+	"tts_cache": "tts_cache",
 }
 SOURCE_PATHS = [
 	"Kage_no_Jitsuryokusha_ni_Naritakute_",  # Kotatsu CBZ or DIR
@@ -25,6 +25,8 @@ SOURCE_PATHS = [
 ]
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 ARCHIVE_EXTENSIONS = {".cbz", ".zip"}
+INGESTION_CHUNK_SIZE = 1048576
+STREAMING_INGESTION = True
 OUTPUT_IMAGE_EXTENSION = ".jpg"
 AUDIO_OUTPUT_EXTENSION = ".wav"
 PREFIX_LENGTH = 4
@@ -46,10 +48,24 @@ TRANSITION_GAPS_FILENAME = "transition_gaps.json"
 AUDIO_CONCAT_LIST_FILENAME = "audio_list.txt"
 FADE_VIDEO_LIST_FILENAME = "fade_video_list.txt"
 COST_FILENAME = "cost.json"
+INGESTION_MANIFEST_FILENAME = "ingestion.json"
+BUILD_STATE_FILENAME = "build.json"
+AUDIO_INDEX_FILENAME = "audio_index.json"
+OCR_CACHE_FILENAME = "ocr_cache.sqlite"
+CROP_MANIFEST_FILENAME = "crops.json"
+METADATA_FILENAME = "metadata.sqlite"
+LEGACY_METADATA_DIRS = {"durations": "image_durations", "gaps": "image_gaps"}  # Imported into METADATA_FILENAME once
 TARGET_WIDTH = 900
+REDUCED_DECODE = True  # Decode wide JPEG pages at 1/2, 1/4 or 1/8 scale before resizing
+RESIZE_QUALITY = 100  # JPEG quality of image_resized pages, lower values shrink them
 TARGET_HEIGHT = 1280
 MARGIN = 16
 MAX_DISTANCE = 32
+READING_DIRECTION = "rtl"  # "rtl" for manga, "ltr" for manhwa and webtoons
+TILE_HEIGHT = 2048  # Detect taller pages in overlapping tiles, 0 disables tiling
+TILE_OVERLAP = 256
+DEBUG_ARTIFACTS = "off"  # "off", "grouped" (image_grouped only) or "all" (image_boxed too)
+CROP_MANIFEST = False  # Keep crops as page regions in merge instead of image_crops files
 HEIGHT_RANGE = 96
 LANGUAGE = "Russian"
 MAX_TOKENS = 2000
@@ -57,12 +73,17 @@ TEXT_MIN_SIZE = 13
 AUDIO_MIN_SIZE = 78
 REFERENCE_AUDIO = "_reference/reference_audio.flac"
 REFERENCE_TEXT = "_reference/reference_text.txt"
+REGISTER_REFERENCE = False  # Upload the reference to the Fish server once and send only its ID
 SAMPLE_RATE = 48000
+FISH_STREAMING = True
 FISH_TEMPERATURE = 0.1
+TTS_CHUNK_SIZE = 65536
 ENCODING_NAME = "cl100k_base"
 MODEL = "meta-llama/Llama-4-Scout-17B-16E-Instruct"  # "google/gemini-2.0-flash-001"  # google/gemini-2.5-flash-preview"  # "google/gemma-3-27b-it"
 PAUSE = 10
 PROMPT = f'Proofread this text in {LANGUAGE} but only fix grammar without any introductory phrases or additional commentary. If no readable text is found, the text content is empty. Return JSON: [{{"text": "text content"}}, ...]'
+BATCH_PROMPT = f'Proofread the text of each numbered image in {LANGUAGE} but only fix grammar without any introductory phrases or additional commentary. If no readable text is found in an image, its text content is empty. Return JSON: [{{"image": 1, "text": "text content"}}, ...]'
+BATCH_SIZE = 8
 RETRIES = 3
 TEMPERATURE = 0.0
 TEMPERATURE_STEP = 0.2
@@ -75,6 +96,14 @@ API_ENDPOINTS = [
 	"https://api.openai.com/v1/audio/speech",  # OpenAI
 	"https://openrouter.ai/api/v1/chat/completions",  # OpenRouter
 ]
+API_LIMITS = {
+	API_ENDPOINTS[0]: (0, 0),  # Fish
+	API_ENDPOINTS[1]: (0, 0),  # Kokoro
+	API_ENDPOINTS[2]: (600, 1000000),  # DeepInfra
+	API_ENDPOINTS[3]: (60, 0),  # Lemon
+	API_ENDPOINTS[4]: (500, 0),  # OpenAI
+	API_ENDPOINTS[5]: (200, 1000000),  # OpenRouter
+}  # (requests per minute, tokens or characters per minute), 0 is unlimited
 API_KEYS = [
 	"not-needed",  # Kokoro
 	os.environ.get("DEEPINFRA_API_KEY"),  # DeepInfra
@@ -112,8 +141,11 @@ COST_OPENAI = (5.00, 15.00)
 COST_OPENROUTER = (0.10, 0.20)
 COST_TTS = 15.0
 WORKERS = 6
+DETECTION_SERVER = True  # One shared detection model process instead of one per worker
+PIPELINE_ACTIONS = [1, 2, 3, 4, 5, 6, 7, 8, 10, 14, 15]
 TARGET_FPS = 60
 AUDIO_DELAY_DURATION = 1
+AUDIO_SINGLE_PASS = True  # Render from one memory-mapped PCM buffer instead of resized clip files
 AUDIO_TARGET_SEGMENT_DURATION = 1
 AUDIO_TRANSITION_DURATION = 0.5
 VIDEO_HOLD_DURATION = 2
@@ -1,19 +1,31 @@
 from multiprocessing import Pool, cpu_count
+from multiprocessing.connection import Client, Listener, arbitrary_address
+from multiprocessing.util import Finalize
+import aiohttp
+import asyncio
 import base64
 import bisect
 import cv2
+import email.utils
 import functools
+import hashlib
 import imageio.v3 as iio
 import json
 import math
+import multiprocessing
 import numpy as np
 import os
+import queue
+import random
 import regex
 import requests
 import shutil
+import sqlite3
 import subprocess
+import threading
 import tiktoken
 import time
+import wave
 import zipfile
 
 
@@ -42,75 +54,323 @@ def extract_archive(output_dir, prefix, prefix_length, zip_path):
 				f.write(data)
 
 
+def list_images(image_extensions, input_dir):
+	return sorted(
+		[
+			f
+			for f in os.listdir(input_dir)
+			if os.path.isfile(os.path.join(input_dir, f))
+			and os.path.splitext(f)[1].lower() in image_extensions
+			and not f.startswith(".")
+		],
+		key=natural_sort,
+	)
+
+
 def move_images(image_extensions, input_dir, output_dir, prefix, prefix_length):
-	images = [
-		f
-		for f in os.listdir(input_dir)
-		if os.path.isfile(os.path.join(input_dir, f))
-		and os.path.splitext(f)[1].lower() in image_extensions
-		and not f.startswith(".")
-	]
-	for image in sorted(images, key=natural_sort):
+	for image in list_images(image_extensions, input_dir):
 		filename = f"{prefix:0{prefix_length}d}_{image}"
 		output_path = os.path.join(output_dir, filename)
 		shutil.copy(os.path.join(input_dir, image), output_path)
 
 
+def list_source(archive_extensions, image_extensions, source_path):
+	archives = []
+	sub_dirs = []
+	images = []
+	if (
+		os.path.isfile(source_path)
+		and os.path.splitext(source_path)[1].lower() in archive_extensions
+	):
+		archives = [source_path]
+	elif os.path.isdir(source_path):
+		paths = os.listdir(source_path)
+		archives = [
+			os.path.join(source_path, f)
+			for f in sorted(
+				[
+					f
+					for f in paths
+					if os.path.isfile(os.path.join(source_path, f))
+					and os.path.splitext(f)[1].lower() in archive_extensions
+				],
+				key=natural_sort,
+			)
+		]
+		sub_dirs = [
+			os.path.join(source_path, f)
+			for f in sorted(
+				[f for f in paths if os.path.isdir(os.path.join(source_path, f))],
+				key=natural_sort,
+			)
+		]
+		images = list_images(image_extensions, source_path)
+	return archives, sub_dirs, images
+
+
+def list_archive_images(image_extensions, zip_path):
+	if not zipfile.is_zipfile(zip_path):
+		return []
+	with zipfile.ZipFile(zip_path) as z:
+		return [
+			(info.filename, info.CRC)
+			for info in z.infolist()
+			if not info.is_dir()
+			and os.path.splitext(info.filename)[1].lower() in image_extensions
+			and not os.path.basename(info.filename).startswith(".")
+		]
+
+
+def get_file_signature(path):
+	stat = os.stat(path)
+	return [stat.st_size, stat.st_mtime_ns]
+
+
+def list_source_members(image_extensions, manifest, source):
+	if os.path.isdir(source):
+		return [
+			(image, get_file_signature(os.path.join(source, image)))
+			for image in list_images(image_extensions, source)
+		]
+	record = manifest.get(os.path.abspath(source))
+	if record and record["signature"] == get_file_signature(source):
+		return [
+			(member, member_record["checksum"])
+			for member, member_record in record["members"].items()
+		]
+	return list_archive_images(image_extensions, source)
+
+
+def plan_ingestion(
+	archive_extensions, image_extensions, manifest, prefix_length, source_path
+):
+	archives, sub_dirs, images = list_source(
+		archive_extensions, image_extensions, source_path
+	)
+	sources = []
+	if archives:
+		sources = archives
+	elif sub_dirs:
+		sources = sub_dirs
+	elif images:
+		sources = [source_path]
+	entries = []
+	for i, source in enumerate(sources):
+		for member, checksum in list_source_members(
+			image_extensions, manifest, source
+		):
+			basename = os.path.basename(member)
+			name = f"{i:0{prefix_length}d}_{basename}"
+			entries.append((name, source, member, checksum))
+	return sorted(entries, key=lambda entry: natural_sort(entry[0]))
+
+
+def stream_members(chunk_size, members, source):
+	written = 0
+	if os.path.isdir(source):
+		for member, output_path in members:
+			with open(os.path.join(source, member), "rb") as src:
+				with open(output_path, "wb") as dst:
+					shutil.copyfileobj(src, dst, chunk_size)
+					written += dst.tell()
+		return written
+	with zipfile.ZipFile(source) as z:
+		for member, output_path in members:
+			with z.open(member) as src, open(output_path, "wb") as dst:
+				shutil.copyfileobj(src, dst, chunk_size)
+				written += dst.tell()
+	return written
+
+
+def load_json_dict(path):
+	if not os.path.exists(path):
+		return {}
+	try:
+		with open(path, encoding="utf-8") as f:
+			return json.load(f)
+	except:
+		return {}
+
+
+def get_next_image_counter(manifest):
+	numbers = [
+		int(os.path.splitext(member_record["output"])[0])
+		for record in manifest.values()
+		for member_record in record["members"].values()
+		if os.path.splitext(member_record["output"])[0].isdigit()
+	]
+	return max(numbers) + 1 if numbers else 1
+
+
+def stream_ingestion(
+	archive_extensions,
+	chunk_size,
+	image_extensions,
+	manifest_path,
+	output_dir,
+	output_filename_length,
+	prefix_length,
+	source_path,
+	workers_config,
+):
+	manifest = load_json_dict(manifest_path)
+	entries = plan_ingestion(
+		archive_extensions, image_extensions, manifest, prefix_length, source_path
+	)
+	tasks = {}
+	updated_manifest = {}
+	image_counter = get_next_image_counter(manifest)
+	recorded = [
+		i
+		for i, (_, source, member, _) in enumerate(entries)
+		if member in manifest.get(os.path.abspath(source), {}).get("members", {})
+	]
+	last_recorded = recorded[-1] if recorded else -1
+	skipped = {}
+	for i, (name, source, member, checksum) in enumerate(entries):
+		key = os.path.abspath(source)
+		record = manifest.get(key, {}).get("members", {}).get(member)
+		if not record and i < last_recorded:
+			skipped[source] = skipped.get(source, 0) + 1
+			continue
+		if record:
+			output_filename = record["output"]
+			output_path = os.path.join(output_dir, output_filename)
+			if record["checksum"] != checksum or not os.path.exists(output_path):
+				tasks.setdefault(source, []).append((member, output_path))
+		else:
+			extension = os.path.splitext(name)[1].lower()
+			output_filename = f"{image_counter:0{output_filename_length}d}{extension}"
+			output_path = os.path.join(output_dir, output_filename)
+			if os.path.exists(output_path):
+				continue
+			tasks.setdefault(source, []).append((member, output_path))
+			image_counter += 1
+		if key not in updated_manifest:
+			updated_manifest[key] = {
+				"members": {},
+				"signature": get_file_signature(source),
+			}
+		updated_manifest[key]["members"][member] = {
+			"checksum": checksum,
+			"output": output_filename,
+		}
+	for source, count in skipped.items():
+		print(
+			f"Skipping {count} new pages of {source}: they sort before pages "
+			"already ingested, ingest into an empty image directory to renumber"
+		)
+	written = 0
+	if tasks:
+		workers = max(1, min(workers_config, cpu_count(), len(tasks)))
+		with Pool(processes=workers) as pool:
+			args = [(chunk_size, members, source) for source, members in tasks.items()]
+			written = sum(pool.starmap_async(stream_members, args).get())
+	manifest.update(updated_manifest)
+	save_json_dict(manifest, manifest_path)
+	return sum(len(members) for members in tasks.values()), written
+
+
+def get_peak_rss():
+	try:
+		import resource
+	except ImportError:
+		return 0
+	peak = max(
+		resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+		resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+	)
+	return peak * 1024 if os.uname().sysname != "Darwin" else peak
+
+
+def get_dir_sizes(input_dir):
+	sizes = {}
+	for entry in os.scandir(input_dir):
+		if entry.is_file():
+			sizes[entry.name] = entry.stat().st_size
+	return sizes
+
+
 def prepare(
 	archive_extensions,
 	argv,
+	chunk_size,
 	dirs,
 	image_extensions,
+	ingestion_manifest_filename,
 	output_filename_length,
 	prefix_length,
 	source_paths,
+	streaming,
+	workers_config,
 ):
 	source_path = source_paths[1]
 	if len(argv) > 1:
 		source_path = argv[1]
 	output_dir = dirs["image"]
 	temp_dir = dirs["temp"]
-	if (
-		os.path.isfile(source_path)
-		and os.path.splitext(source_path)[1].lower() in archive_extensions
-	):
-		extract_archive(temp_dir, 0, prefix_length, source_path)
-	elif os.path.isdir(source_path):
-		paths = os.listdir(source_path)
-		archives = sorted(
-			[
-				f
-				for f in paths
-				if os.path.isfile(os.path.join(source_path, f))
-				and os.path.splitext(f)[1].lower() in archive_extensions
-			],
-			key=natural_sort,
+	start_time = time.perf_counter()
+	initial_sizes = get_dir_sizes(output_dir)
+	if streaming:
+		files, written = stream_ingestion(
+			archive_extensions,
+			chunk_size,
+			image_extensions,
+			os.path.join(dirs["merge"], ingestion_manifest_filename),
+			output_dir,
+			output_filename_length,
+			prefix_length,
+			source_path,
+			workers_config,
 		)
-		sub_dirs = sorted(
-			[f for f in paths if os.path.isdir(os.path.join(source_path, f))],
-			key=natural_sort,
+	else:
+		prepare_temp(
+			archive_extensions,
+			image_extensions,
+			output_dir,
+			output_filename_length,
+			prefix_length,
+			source_path,
+			temp_dir,
 		)
-		images = sorted(
-			[
-				f
-				for f in paths
-				if os.path.isfile(os.path.join(source_path, f))
-				and os.path.splitext(f)[1].lower() in image_extensions
-				and not f.startswith(".")
-			],
-			key=natural_sort,
+	elapsed = time.perf_counter() - start_time
+	if not streaming:
+		final_sizes = get_dir_sizes(output_dir)
+		files = len(final_sizes) - len(initial_sizes)
+		written = sum(
+			size for name, size in final_sizes.items() if name not in initial_sizes
 		)
-		if archives:
-			for i, archive in enumerate(archives):
-				extract_archive(
-					temp_dir, i, prefix_length, os.path.join(source_path, archive)
-				)
-		elif sub_dirs:
-			for i, sub_dir in enumerate(sub_dirs):
-				sub_dir_path = os.path.join(source_path, sub_dir)
-				move_images(image_extensions, sub_dir_path, temp_dir, i, prefix_length)
-		elif images:
-			move_images(image_extensions, source_path, temp_dir, 0, prefix_length)
+	report = {
+		"bytes": written,
+		"bytes_per_second": round(written / elapsed, 2) if elapsed > 0 else 0.0,
+		"files": files,
+		"peak_rss": get_peak_rss(),
+		"seconds": round(elapsed, 4),
+		"streaming": streaming,
+	}
+	print(json.dumps(report, indent="\t", ensure_ascii=False, sort_keys=True))
+
+
+def prepare_temp(
+	archive_extensions,
+	image_extensions,
+	output_dir,
+	output_filename_length,
+	prefix_length,
+	source_path,
+	temp_dir,
+):
+	archives, sub_dirs, images = list_source(
+		archive_extensions, image_extensions, source_path
+	)
+	if archives:
+		for i, archive in enumerate(archives):
+			extract_archive(temp_dir, i, prefix_length, archive)
+	elif sub_dirs:
+		for i, sub_dir in enumerate(sub_dirs):
+			move_images(image_extensions, sub_dir, temp_dir, i, prefix_length)
+	elif images:
+		move_images(image_extensions, source_path, temp_dir, 0, prefix_length)
 	temp_images = []
 	for f in os.listdir(temp_dir):
 		temp_path = os.path.join(temp_dir, f)
@@ -136,13 +396,226 @@ def prepare(
 	os.makedirs(temp_dir, exist_ok=True)
 
 
-def resize_image(filename, input_dir, output_dir, output_image_extension, target_width):
+def get_digest(data):
+	text = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+	return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def get_build_signature(digest, path):
+	if not os.path.exists(path):
+		return [digest]
+	return get_file_signature(path) + [digest]
+
+
+def has_output(output_dir, output_extension, filename):
+	basename = os.path.splitext(filename)[0]
+	return os.path.exists(os.path.join(output_dir, f"{basename}{output_extension}"))
+
+
+def filter_stale(
+	filenames, input_dir, output_dir, output_extension, parameters, state, step
+):
+	return filter_stale_outputs(
+		functools.partial(has_output, output_dir, output_extension),
+		filenames,
+		input_dir,
+		parameters,
+		state,
+		step,
+	)
+
+
+def filter_stale_outputs(exists, filenames, input_dir, parameters, state, step):
+	digest = get_digest(parameters)
+	records = state.get(step, {})
+	stale = []
+	for filename in filenames:
+		output_exists = exists(filename)
+		record = records.get(filename)
+		if record is None:
+			if not output_exists:
+				stale.append(filename)
+			continue
+		signature = get_build_signature(digest, os.path.join(input_dir, filename))
+		if record[:-1] != signature or (record[-1] and not output_exists):
+			stale.append(filename)
+	return stale
+
+
+def filter_changed(filenames, input_dir, parameters, state, step):
+	digest = get_digest(parameters)
+	records = state.get(step, {})
+	return [
+		filename
+		for filename in filenames
+		if filename in records
+		and records[filename][:-1]
+		!= get_build_signature(digest, os.path.join(input_dir, filename))
+	]
+
+
+def record_build(
+	filenames, input_dir, output_dir, output_extension, parameters, state, step
+):
+	record_build_outputs(
+		functools.partial(has_output, output_dir, output_extension),
+		filenames,
+		input_dir,
+		parameters,
+		state,
+		step,
+	)
+
+
+def record_build_outputs(exists, filenames, input_dir, parameters, state, step):
+	digest = get_digest(parameters)
+	records = state.setdefault(step, {})
+	for filename in filenames:
+		signature = get_build_signature(digest, os.path.join(input_dir, filename))
+		records[filename] = signature + [exists(filename)]
+
+
+def remove_outputs(filenames, output_dir, output_extension):
+	for filename in filenames:
+		basename = os.path.splitext(filename)[0]
+		output_path = os.path.join(output_dir, f"{basename}{output_extension}")
+		if os.path.exists(output_path):
+			os.remove(output_path)
+
+
+def open_metadata_store(path):
+	store = sqlite3.connect(path, check_same_thread=False, timeout=60)
+	store.execute("PRAGMA journal_mode=WAL")
+	store.execute("PRAGMA synchronous=NORMAL")
+	store.execute(
+		"CREATE TABLE IF NOT EXISTS gaps (key TEXT PRIMARY KEY, page TEXT, value)"
+	)
+	store.execute("CREATE INDEX IF NOT EXISTS gaps_page ON gaps (page)")
+	store.execute("CREATE TABLE IF NOT EXISTS durations (key TEXT PRIMARY KEY, value)")
+	store.commit()
+	return store
+
+
+def import_legacy_metadata(legacy_metadata_dirs, store):
+	if store.execute("PRAGMA user_version").fetchone()[0]:
+		return
+	gaps = []
+	input_dir = legacy_metadata_dirs["gaps"]
+	if os.path.isdir(input_dir):
+		for filename in os.listdir(input_dir):
+			if filename.endswith(".json"):
+				page = os.path.splitext(filename)[0]
+				for key, value in load_json_dict(
+					os.path.join(input_dir, filename)
+				).items():
+					gaps.append((key, page, value))
+	durations = []
+	input_dir = legacy_metadata_dirs["durations"]
+	if os.path.isdir(input_dir):
+		for filename in os.listdir(input_dir):
+			if filename.endswith(".json"):
+				durations.extend(
+					load_json_dict(os.path.join(input_dir, filename)).items()
+				)
+	store.executemany(
+		"INSERT OR IGNORE INTO gaps (key, page, value) VALUES (?, ?, ?)", gaps
+	)
+	store.executemany(
+		"INSERT OR IGNORE INTO durations (key, value) VALUES (?, ?)", durations
+	)
+	store.execute("PRAGMA user_version = 1")
+	store.commit()
+	if gaps or durations:
+		print(f"Imported {len(gaps)} gaps and {len(durations)} durations")
+
+
+@functools.lru_cache(maxsize=None)
+def get_metadata_store(path):
+	return open_metadata_store(path)
+
+
+def get_metadata_column(table):
+	return "page" if table == "gaps" else "key"
+
+
+def has_metadata(store, table, filename):
+	row = store.execute(
+		f"SELECT 1 FROM {table} WHERE {get_metadata_column(table)} = ? LIMIT 1",
+		(os.path.splitext(filename)[0],),
+	).fetchone()
+	return row is not None
+
+
+def read_metadata(store, table):
+	return dict(store.execute(f"SELECT key, value FROM {table}").fetchall())
+
+
+def remove_metadata(filenames, store, table):
+	store.executemany(
+		f"DELETE FROM {table} WHERE {get_metadata_column(table)} = ?",
+		[(os.path.splitext(f)[0],) for f in filenames],
+	)
+	store.commit()
+
+
+def get_step_signature(input_paths, parameters):
+	digest = get_digest(parameters)
+	return get_digest(
+		[[path] + get_build_signature(digest, path) for path in sorted(input_paths)]
+	)
+
+
+def is_step_stale(input_paths, output_paths, parameters, state, step):
+	if not all(os.path.exists(path) for path in output_paths):
+		return True
+	return state.get(step) != get_step_signature(input_paths, parameters)
+
+
+def record_step(input_paths, parameters, state, step):
+	state[step] = get_step_signature(input_paths, parameters)
+
+
+def save_json_dict(data, path):
+	with open(path, "w", encoding="utf-8") as f:
+		json.dump(data, f, indent="\t", ensure_ascii=False, sort_keys=True)
+
+
+def get_reduced_decode_flag(target_width, width):
+	for factor, flag in (
+		(8, cv2.IMREAD_REDUCED_COLOR_8),
+		(4, cv2.IMREAD_REDUCED_COLOR_4),
+		(2, cv2.IMREAD_REDUCED_COLOR_2),
+	):
+		if width // factor >= target_width:
+			return flag
+	return cv2.IMREAD_COLOR
+
+
+def resize_image(
+	filename,
+	input_dir,
+	output_dir,
+	output_image_extension,
+	reduced_decode,
+	resize_quality,
+	target_width,
+):
 	path = os.path.join(input_dir, filename)
-	image = cv2.imread(path)
+	flag = cv2.IMREAD_COLOR
+	if reduced_decode and filename.lower().endswith((".jpg", ".jpeg")):
+		flag = get_reduced_decode_flag(target_width, iio.improps(path).shape[1])
+	image = cv2.imread(path, flag)
+	if flag != cv2.IMREAD_COLOR and image.shape[1] < target_width:
+		flag = cv2.IMREAD_COLOR
+		image = cv2.imread(path)
 	height, width = image.shape[:2]
 	basename = os.path.splitext(filename)[0]
 	output_path = os.path.join(output_dir, f"{basename}{output_image_extension}")
-	if width == target_width and filename.lower().endswith(output_image_extension):
+	if (
+		flag == cv2.IMREAD_COLOR
+		and width == target_width
+		and filename.lower().endswith(output_image_extension)
+	):
 		shutil.copy(path, output_path)
 		return
 	if width != target_width:
@@ -150,27 +623,65 @@ def resize_image(filename, input_dir, output_dir, output_image_extension, target
 		image = cv2.resize(
 			image, (target_width, new_height), interpolation=cv2.INTER_AREA
 		)
-	cv2.imwrite(output_path, image, [cv2.IMWRITE_JPEG_QUALITY, 100])
+	cv2.imwrite(output_path, image, [cv2.IMWRITE_JPEG_QUALITY, resize_quality])
 
 
-def split_batches(items, num_workers):
-	batches = [[] for _ in range(num_workers)]
-	for i, item in enumerate(items):
-		batches[i % num_workers].append(item)
-	return batches
+def timed_call(task):
+	function, item, args = task
+	start_time = time.perf_counter()
+	function(*args)
+	return item, time.perf_counter() - start_time
 
 
-def batch_resize_images(
-	batch, input_dir, output_dir, output_image_extension, target_width
-):
-	for filename in batch:
-		resize_image(
-			filename, input_dir, output_dir, output_image_extension, target_width
-		)
+def get_percentile(percent, values):
+	if not values:
+		return 0.0
+	index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+	return values[index]
+
+
+def report_timings(start_time, step, timings, workers):
+	values = sorted(timings.values())
+	slowest = sorted(timings, key=timings.get, reverse=True)[:5]
+	report = {
+		"count": len(values),
+		"max": round(values[-1], 4) if values else 0.0,
+		"mean": round(sum(values) / len(values), 4) if values else 0.0,
+		"p50": round(get_percentile(50, values), 4),
+		"p90": round(get_percentile(90, values), 4),
+		"p99": round(get_percentile(99, values), 4),
+		"slowest": [[item, round(timings[item], 4)] for item in slowest],
+		"step": step,
+		"wall": round(time.perf_counter() - start_time, 4),
+		"workers": workers,
+	}
+	print(json.dumps(report, indent="\t", ensure_ascii=False, sort_keys=True))
+
+
+def run_tasks(function, rate_limiters, step, tasks, workers):
+	timings = {}
+	start_time = time.perf_counter()
+	with Pool(
+		processes=workers, initializer=init_rate_limiters, initargs=(rate_limiters,)
+	) as pool:
+		args = [(function, item, item_args) for item, item_args in tasks]
+		for item, elapsed in pool.imap_unordered(timed_call, args, chunksize=1):
+			timings[item] = elapsed
+		pool.close()
+		pool.join()
+	report_timings(start_time, step, timings, workers)
+	return timings
 
 
 def resize_to_width(
-	dirs, image_extensions, output_image_extension, target_width, workers_config
+	build_state_filename,
+	dirs,
+	image_extensions,
+	output_image_extension,
+	reduced_decode,
+	resize_quality,
+	target_width,
+	workers_config,
 ):
 	images = sorted(
 		[
@@ -179,20 +690,51 @@ def resize_to_width(
 			if any(f.lower().endswith(ext) for ext in image_extensions)
 		]
 	)
-	workers = min(workers_config, cpu_count())
-	batches = split_batches(images, workers)
-	with Pool(processes=workers) as pool:
-		args = [
+	state_path = os.path.join(dirs["merge"], build_state_filename)
+	state = load_json_dict(state_path)
+	parameters = {
+		"output_image_extension": output_image_extension,
+		"reduced_decode": reduced_decode,
+		"resize_quality": resize_quality,
+		"target_width": target_width,
+	}
+	stale = filter_stale(
+		images,
+		dirs["image"],
+		dirs["image_resized"],
+		output_image_extension,
+		parameters,
+		state,
+		"resize_to_width",
+	)
+	if stale:
+		workers = min(workers_config, cpu_count())
+		tasks = [
 			(
-				batch,
-				dirs["image"],
-				dirs["image_resized"],
-				output_image_extension,
-				target_width,
+				filename,
+				(
+					filename,
+					dirs["image"],
+					dirs["image_resized"],
+					output_image_extension,
+					reduced_decode,
+					resize_quality,
+					target_width,
+				),
 			)
-			for batch in batches
+			for filename in stale
 		]
-		pool.starmap_async(batch_resize_images, args).get()
+		run_tasks(resize_image, {}, "resize_to_width", tasks, workers)
+	record_build(
+		images,
+		dirs["image"],
+		dirs["image_resized"],
+		output_image_extension,
+		parameters,
+		state,
+		"resize_to_width",
+	)
+	save_json_dict(state, state_path)
 
 
 def get_basenames(input_dir):
@@ -259,61 +801,86 @@ def lists(
 					os.remove(path)
 
 
-def get_box_bounds(box):
-	min_x = min(p[0] for p in box)
-	min_y = min(p[1] for p in box)
-	max_x = max(p[0] for p in box)
-	max_y = max(p[1] for p in box)
-	return min_x, min_y, max_x, max_y
+def get_boxes_bounds(boxes):
+	try:
+		points = np.asarray(boxes)
+		if points.ndim != 3 or points.dtype == object:
+			raise ValueError
+		return np.concatenate((points.min(axis=1), points.max(axis=1)), axis=1)
+	except ValueError:
+		return np.array(
+			[
+				[
+					min(p[0] for p in box),
+					min(p[1] for p in box),
+					max(p[0] for p in box),
+					max(p[1] for p in box),
+				]
+				for box in boxes
+			]
+		)
 
 
-def get_box_distance(box1, box2):
-	min_x1, min_y1, max_x1, max_y1 = get_box_bounds(box1)
-	min_x2, min_y2, max_x2, max_y2 = get_box_bounds(box2)
-	dx = max(min_x1 - max_x2, min_x2 - max_x1, 0)
-	dy = max(min_y1 - max_y2, min_y2 - max_y1, 0)
-	return math.sqrt(dx**2 + dy**2)
+def get_box_pairs(bounds, max_distance):
+	values = bounds.astype(np.float64)
+	order = np.argsort(values[:, 1], kind="stable")
+	sorted_bounds = values[order]
+	ends = np.searchsorted(
+		sorted_bounds[:, 1], sorted_bounds[:, 3] + max_distance, side="right"
+	)
+	firsts = []
+	seconds = []
+	for p in range(len(order)):
+		candidates = sorted_bounds[p + 1 : ends[p]]
+		if len(candidates) == 0:
+			continue
+		min_x, min_y, max_x, max_y = sorted_bounds[p]
+		dx = np.maximum(
+			np.maximum(min_x - candidates[:, 2], candidates[:, 0] - max_x), 0
+		)
+		dy = np.maximum(
+			np.maximum(min_y - candidates[:, 3], candidates[:, 1] - max_y), 0
+		)
+		matches = np.nonzero(np.sqrt(dx * dx + dy * dy) <= max_distance)[0]
+		firsts.append(np.full(len(matches), order[p]))
+		seconds.append(order[p + 1 + matches])
+	if not firsts:
+		return [], []
+	return np.concatenate(firsts).tolist(), np.concatenate(seconds).tolist()
 
 
-def collect_connected_nodes(adj_list, current, node, visited):
-	visited[node] = True
-	current.append(node)
-	for neighbor in adj_list[node]:
-		if not visited[neighbor]:
-			collect_connected_nodes(adj_list, current, neighbor, visited)
+def find_root(node, parents):
+	while parents[node] != node:
+		parents[node] = parents[parents[node]]
+		node = parents[node]
+	return node
 
 
-def group_boxes(boxes, max_distance):
-	count = len(boxes)
+def group_boxes(bounds, max_distance):
+	count = len(bounds)
 	if count == 0:
 		return []
-	adj_list = [[] for _ in range(count)]
-	for i in range(count):
-		for j in range(i + 1, count):
-			if get_box_distance(boxes[i], boxes[j]) <= max_distance:
-				adj_list[i].append(j)
-				adj_list[j].append(i)
-	visited = [False] * count
-	groups = []
-	for i in range(count):
-		if not visited[i]:
-			current = []
-			collect_connected_nodes(adj_list, current, i, visited)
-			groups.append(current)
-	return groups
-
-
-def get_bounds_and_centers(boxes, groups, margin):
+	parents = list(range(count))
+	for i, j in zip(*get_box_pairs(bounds, max_distance)):
+		root_i = find_root(i, parents)
+		root_j = find_root(j, parents)
+		if root_i != root_j:
+			parents[max(root_i, root_j)] = min(root_i, root_j)
+	groups = {}
+	for node in range(count):
+		groups.setdefault(find_root(node, parents), []).append(node)
+	return list(groups.values())
+
+
+def get_bounds_and_centers(box_bounds, groups, margin):
 	bounds = []
 	centers = []
 	for group in groups:
-		points = []
-		for i in group:
-			points.extend(boxes[i])
-		min_x = min(p[0] for p in points) - margin
-		min_y = min(p[1] for p in points) - margin
-		max_x = max(p[0] for p in points) + margin
-		max_y = max(p[1] for p in points) + margin
+		group_bounds = box_bounds[group]
+		min_x = group_bounds[:, 0].min().item() - margin
+		min_y = group_bounds[:, 1].min().item() - margin
+		max_x = group_bounds[:, 2].max().item() + margin
+		max_y = group_bounds[:, 3].max().item() + margin
 		bounds.append((min_x, min_y, max_x, max_y))
 		center_x = (min_x + max_x) / 2
 		center_y = (min_y + max_y) / 2
@@ -321,36 +888,39 @@ def get_bounds_and_centers(boxes, groups, margin):
 	return bounds, centers
 
 
-def get_priority(corner_dist, y_diff):
-	return (y_diff * 3) + corner_dist
-
-
-def order_boxes(bounds, centers, width):
+def order_boxes(bounds, centers, reading_direction, width):
 	if not centers:
 		return []
-	ranking = []
-	for i, center in enumerate(centers):
-		corner_dist = math.sqrt((width - center[0]) ** 2 + center[1] ** 2)
-		y_pos = bounds[i][1]
-		ranking.append((i, corner_dist, y_pos))
-	ranking.sort(key=lambda x: x[1])
-	order = [ranking[0][0]]
-	prev_y = bounds[ranking[0][0]][1]
-	unprocessed = ranking[1:]
-	while unprocessed:
-		scores = []
-		for i, corner_dist, y_pos in unprocessed:
-			y_diff = abs(y_pos - prev_y)
-			score = get_priority(corner_dist, y_diff)
-			scores.append((i, score))
-		scores.sort(key=lambda x: x[1])
-		next_index = scores[0][0]
-		order.append(next_index)
-		prev_y = bounds[next_index][1]
-		unprocessed = [(i, d, y) for i, d, y in unprocessed if i != next_index]
+	points = np.array(centers, dtype=np.float64)
+	if reading_direction == "ltr":
+		corner_dists = np.sqrt(points[:, 0] ** 2 + points[:, 1] ** 2)
+	else:
+		corner_dists = np.sqrt((width - points[:, 0]) ** 2 + points[:, 1] ** 2)
+	ranking = np.argsort(corner_dists, kind="stable")
+	corner_dists = corner_dists[ranking]
+	y_positions = np.array([bounds[i][1] for i in ranking], dtype=np.float64)
+	order = [int(ranking[0])]
+	prev_y = y_positions[0]
+	scores = np.empty(len(ranking))
+	processed = np.zeros(len(ranking), dtype=bool)
+	processed[0] = True
+	for _ in range(len(ranking) - 1):
+		np.abs(y_positions - prev_y, out=scores)
+		scores *= 3
+		scores += corner_dists
+		scores[processed] = np.inf
+		position = int(np.argmin(scores))
+		processed[position] = True
+		order.append(int(ranking[position]))
+		prev_y = y_positions[position]
 	return order
 
 
+def draw_detected_boxes(boxes, image):
+	polygons = [np.array(box).astype(np.int64).reshape(-1, 1, 2) for box in boxes]
+	return cv2.polylines(image.copy(), polygons, True, (0, 0, 255), 2)
+
+
 def draw_boxes(bounds, image, order):
 	image_copy = image.copy()
 	for i, box_index in enumerate(order):
@@ -370,28 +940,42 @@ def draw_boxes(bounds, image, order):
 	return image_copy
 
 
-def crop_images(
+def get_crop_regions(
 	basename,
 	bounds,
 	crop_suffix_length,
-	image,
+	height,
 	order,
-	output_dir,
 	output_image_extension,
+	width,
 ):
-	height, width = image.shape[:2]
+	regions = {}
 	for i, box_index in enumerate(order):
 		x_min, y_min, x_max, y_max = bounds[box_index]
-		x_min = max(0, int(x_min))
-		y_min = max(0, int(y_min))
-		x_max = min(width, int(x_max))
-		y_max = min(height, int(y_max))
-		crop = image[y_min:y_max, x_min:x_max]
 		filename = f"{basename}{i+1:0{crop_suffix_length}d}{output_image_extension}"
+		regions[filename] = [
+			max(0, int(x_min)),
+			max(0, int(y_min)),
+			min(width, int(x_max)),
+			min(height, int(y_max)),
+		]
+	return regions
+
+
+def crop_images(image, output_dir, regions):
+	for filename, (x_min, y_min, x_max, y_max) in regions.items():
+		crop = image[y_min:y_max, x_min:x_max]
 		path = os.path.join(output_dir, filename)
 		cv2.imwrite(path, crop, [cv2.IMWRITE_JPEG_QUALITY, 100])
 
 
+def save_regions_json(filename, output_dir, regions):
+	path = os.path.join(output_dir, f"{os.path.splitext(filename)[0]}.json")
+	data = {"page": filename, "regions": regions}
+	with open(path, "w") as f:
+		json.dump(data, f, indent="\t", ensure_ascii=False, sort_keys=True)
+
+
 def get_gaps(bounds, height, height_range, order):
 	if not order:
 		return [height]
@@ -416,14 +1000,15 @@ def get_gaps(bounds, height, height_range, order):
 	return gaps
 
 
-def save_gaps_json(basename, crop_suffix_length, gaps, output_dir):
-	path = os.path.join(output_dir, f"{basename}.json")
-	data = {}
-	for i, gap in enumerate(gaps):
-		key = f"{basename}{i+1:0{crop_suffix_length}d}"
-		data[key] = gap
-	with open(path, "w") as f:
-		json.dump(data, f, indent="\t", ensure_ascii=False, sort_keys=True)
+def save_gaps(basename, crop_suffix_length, gaps, store):
+	store.executemany(
+		"INSERT OR REPLACE INTO gaps (key, page, value) VALUES (?, ?, ?)",
+		[
+			(f"{basename}{i+1:0{crop_suffix_length}d}", basename, gap)
+			for i, gap in enumerate(gaps)
+		],
+	)
+	store.commit()
 
 
 def init_ocr_engine():
@@ -442,95 +1027,257 @@ def init_ocr_engine():
 	)
 
 
+@functools.lru_cache(maxsize=1)
+def get_ocr_engine():
+	return init_ocr_engine()
+
+
+class DetectionClient:
+	def __init__(self, address):
+		self.connection = Client(
+			address, authkey=multiprocessing.current_process().authkey
+		)
+
+	def detect(self, images):
+		self.connection.send(images)
+		results = self.connection.recv()
+		if isinstance(results, Exception):
+			raise results
+		return results
+
+	def ocr(self, path):
+		return self.detect([path])[0]
+
+
+@functools.lru_cache(maxsize=1)
+def get_detection_client(address):
+	return DetectionClient(address)
+
+
+def handle_detection_client(connection, engine, lock):
+	with connection:
+		while True:
+			try:
+				images = connection.recv()
+			except EOFError:
+				return
+			try:
+				with lock:
+					results = [engine.ocr(image) for image in images]
+			except Exception as e:
+				results = e
+			connection.send(results)
+
+
+def serve_detection(address, ready):
+	engine = get_ocr_engine()
+	lock = threading.Lock()
+	with Listener(
+		address, authkey=multiprocessing.current_process().authkey
+	) as listener:
+		ready.set()
+		while True:
+			connection = listener.accept()
+			threading.Thread(
+				target=handle_detection_client,
+				args=(connection, engine, lock),
+				daemon=True,
+			).start()
+
+
+def start_detection_server():
+	address = arbitrary_address("AF_PIPE" if os.name == "nt" else "AF_UNIX")
+	ready = multiprocessing.Event()
+	process = multiprocessing.Process(
+		target=serve_detection, args=(address, ready), daemon=True
+	)
+	process.start()
+	while not ready.wait(1):
+		if not process.is_alive():
+			raise RuntimeError("Detection server exited before it was ready")
+	return address, process
+
+
+def stop_detection_server(address, process):
+	process.terminate()
+	process.join()
+	if os.name != "nt" and os.path.exists(address):
+		os.remove(address)
+
+
+def get_tile_offsets(height, tile_height, tile_overlap):
+	step = max(1, tile_height - tile_overlap)
+	count = max(2, math.ceil((height - tile_overlap) / step))
+	return [round(i * (height - tile_height) / (count - 1)) for i in range(count)]
+
+
+def detect_boxes(image, ocr_engine, tile_height, tile_overlap):
+	height = image.shape[0]
+	if tile_height <= 0 or height <= tile_height:
+		ocrs = ocr_engine.ocr(image)
+		if not ocrs or len(ocrs) == 0 or not ocrs[0]:
+			return []
+		return [item[0] for item in ocrs[0]]
+	offsets = get_tile_offsets(height, tile_height, tile_overlap)
+	tiles = [image[y : y + tile_height] for y in offsets]
+	if isinstance(ocr_engine, DetectionClient):
+		results = ocr_engine.detect(tiles)
+	else:
+		results = [ocr_engine.ocr(tile) for tile in tiles]
+	boundaries = [0]
+	for i in range(len(offsets) - 1):
+		boundaries.append((offsets[i] + tile_height + offsets[i + 1]) / 2)
+	boundaries.append(height)
+	boxes = []
+	for i, (offset, ocrs) in enumerate(zip(offsets, results)):
+		if not ocrs or not ocrs[0]:
+			continue
+		for item in ocrs[0]:
+			box = [[p[0], p[1] + offset] for p in item[0]]
+			center_y = sum(p[1] for p in box) / len(box)
+			if boundaries[i] <= center_y < boundaries[i + 1]:
+				boxes.append(box)
+	return boxes
+
+
+class ArtifactWriter:
+	def __init__(self):
+		self.queue = queue.Queue(maxsize=4)
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def run(self):
+		while True:
+			image, path = self.queue.get()
+			try:
+				if not cv2.imwrite(path, image, [cv2.IMWRITE_JPEG_QUALITY, 100]):
+					print(f"Error writing {path}")
+			except Exception as e:
+				print(f"Error writing {path}: {e}")
+			finally:
+				self.queue.task_done()
+
+	def write(self, image, path):
+		self.queue.put((image, path))
+
+	def flush(self):
+		self.queue.join()
+
+
+@functools.lru_cache(maxsize=1)
+def get_artifact_writer():
+	writer = ArtifactWriter()
+	Finalize(writer, writer.flush, exitpriority=10)
+	return writer
+
+
 def detect_image(
+	crop_manifest,
 	crop_suffix_length,
+	debug_artifacts,
 	filename,
 	height_range,
 	input_dir,
 	margin,
 	max_distance,
+	metadata_path,
 	ocr_engine,
 	output_dir_box,
 	output_dir_crops,
-	output_dir_gaps,
 	output_dir_group,
+	output_dir_regions,
 	output_image_extension,
+	reading_direction,
+	tile_height,
+	tile_overlap,
 ):
-	from paddleocr import draw_ocr
-
 	basename = os.path.splitext(filename)[0]
 	path = os.path.join(input_dir, filename)
-	ocrs = ocr_engine.ocr(path)
-	if not ocrs or len(ocrs) == 0 or not ocrs[0]:
-		return
-	boxes = [item[0] for item in ocrs[0]]
 	image = cv2.imread(path)
-	image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-	image_box = draw_ocr(image_rgb, boxes)
-	image_box = cv2.cvtColor(image_box, cv2.COLOR_RGB2BGR)
-	path_box = os.path.join(output_dir_box, basename + output_image_extension)
-	cv2.imwrite(path_box, image_box, [cv2.IMWRITE_JPEG_QUALITY, 100])
-	groups = group_boxes(boxes, max_distance)
-	bounds, centers = get_bounds_and_centers(boxes, groups, margin)
-	order = order_boxes(bounds, centers, image.shape[1])
-	image_group = draw_boxes(bounds, image, order)
-	path_group = os.path.join(output_dir_group, basename + output_image_extension)
-	cv2.imwrite(path_group, image_group, [cv2.IMWRITE_JPEG_QUALITY, 100])
-	crop_images(
+	boxes = detect_boxes(image, ocr_engine, tile_height, tile_overlap)
+	if not boxes:
+		return 0
+	if debug_artifacts == "all":
+		get_artifact_writer().write(
+			draw_detected_boxes(boxes, image),
+			os.path.join(output_dir_box, basename + output_image_extension),
+		)
+	box_bounds = get_boxes_bounds(boxes)
+	groups = group_boxes(box_bounds, max_distance)
+	bounds, centers = get_bounds_and_centers(box_bounds, groups, margin)
+	order = order_boxes(bounds, centers, reading_direction, image.shape[1])
+	if debug_artifacts in ("all", "grouped"):
+		get_artifact_writer().write(
+			draw_boxes(bounds, image, order),
+			os.path.join(output_dir_group, basename + output_image_extension),
+		)
+	regions = get_crop_regions(
 		basename,
 		bounds,
 		crop_suffix_length,
-		image,
+		image.shape[0],
 		order,
-		output_dir_crops,
 		output_image_extension,
+		image.shape[1],
 	)
+	if crop_manifest:
+		save_regions_json(filename, output_dir_regions, regions)
+	else:
+		crop_images(image, output_dir_crops, regions)
 	gaps = get_gaps(bounds, image.shape[0], height_range, order)
-	save_gaps_json(basename, crop_suffix_length, gaps, output_dir_gaps)
+	save_gaps(
+		basename, crop_suffix_length, gaps, get_metadata_store(metadata_path)
+	)
+	return len(order)
 
 
-def batch_detect_images(
-	batch,
+def detect_page(
+	crop_manifest,
 	crop_suffix_length,
+	debug_artifacts,
+	detection_address,
+	filename,
 	height_range,
 	input_dir,
 	margin,
 	max_distance,
+	metadata_path,
 	output_dir_box,
 	output_dir_crops,
-	output_dir_gaps,
 	output_dir_group,
+	output_dir_regions,
 	output_image_extension,
+	reading_direction,
+	tile_height,
+	tile_overlap,
 ):
-	ocr_engine = init_ocr_engine()
-	for filename in batch:
-		detect_image(
-			crop_suffix_length,
-			filename,
-			height_range,
-			input_dir,
-			margin,
-			max_distance,
-			ocr_engine,
-			output_dir_box,
-			output_dir_crops,
-			output_dir_gaps,
-			output_dir_group,
-			output_image_extension,
-		)
+	return detect_image(
+		crop_manifest,
+		crop_suffix_length,
+		debug_artifacts,
+		filename,
+		height_range,
+		input_dir,
+		margin,
+		max_distance,
+		metadata_path,
+		get_detection_client(detection_address)
+		if detection_address
+		else get_ocr_engine(),
+		output_dir_box,
+		output_dir_crops,
+		output_dir_group,
+		output_dir_regions,
+		output_image_extension,
+		reading_direction,
+		tile_height,
+		tile_overlap,
+	)
 
 
-def merge_gaps_json(input_dir, merged_gaps_filename, output_dir, total_gaps_filename):
-	data = {}
-	total = 0
-	files = [f for f in os.listdir(input_dir) if f.endswith(".json")]
-	for filename in files:
-		path = os.path.join(input_dir, filename)
-		with open(path) as f:
-			gap_data = json.load(f)
-		for key, value in gap_data.items():
-			data[key] = value
-			total += value
+def merge_gaps_json(merged_gaps_filename, output_dir, store, total_gaps_filename):
+	data = read_metadata(store, "gaps")
+	total = sum(data.values())
 	path = os.path.join(output_dir, merged_gaps_filename)
 	with open(path, "w") as f:
 		json.dump(data, f, indent="\t", ensure_ascii=False, sort_keys=True)
@@ -539,14 +1286,152 @@ def merge_gaps_json(input_dir, merged_gaps_filename, output_dir, total_gaps_file
 		f.write(str(total))
 
 
+def merge_regions_json(crop_manifest_filename, input_dir, output_dir):
+	data = {}
+	files = [f for f in os.listdir(input_dir) if f.endswith(".json")]
+	for filename in files:
+		page_data = load_json_dict(os.path.join(input_dir, filename))
+		for order, crop in enumerate(sorted(page_data.get("regions", {}))):
+			data[crop] = {
+				"bounds": page_data["regions"][crop],
+				"order": order,
+				"page": page_data["page"],
+			}
+	path = os.path.join(output_dir, crop_manifest_filename)
+	with open(path, "w") as f:
+		json.dump(data, f, indent="\t", ensure_ascii=False, sort_keys=True)
+
+
+def list_crops(crop_manifest, crop_manifest_filename, dirs, output_image_extension):
+	if crop_manifest:
+		return sorted(
+			load_json_dict(os.path.join(dirs["merge"], crop_manifest_filename))
+		)
+	return sorted(
+		[
+			f
+			for f in os.listdir(dirs["image_crops"])
+			if f.lower().endswith(output_image_extension)
+		]
+	)
+
+
+class CropReader:
+	def __init__(self, crop_manifest, crop_suffix_length, dirs):
+		self.crop_manifest = crop_manifest
+		self.crop_suffix_length = crop_suffix_length
+		self.dirs = dirs
+		self.read_regions = functools.lru_cache(maxsize=None)(self.load_regions)
+		self.read_page = functools.lru_cache(maxsize=4)(self.load_page)
+
+	def load_regions(self, basename):
+		return load_json_dict(
+			os.path.join(self.dirs["image_regions"], f"{basename}.json")
+		)
+
+	def load_page(self, basename):
+		page = self.read_regions(basename)["page"]
+		return cv2.imread(os.path.join(self.dirs["image_resized"], page))
+
+	def get_region(self, filename):
+		basename = os.path.splitext(filename)[0][: -self.crop_suffix_length]
+		return basename, self.read_regions(basename)["regions"][filename]
+
+	def read_pixels(self, filename):
+		if not self.crop_manifest:
+			path = os.path.join(self.dirs["image_crops"], filename)
+			return cv2.imread(path, cv2.IMREAD_UNCHANGED)
+		basename, (x_min, y_min, x_max, y_max) = self.get_region(filename)
+		return self.read_page(basename)[y_min:y_max, x_min:x_max]
+
+	def read_bytes(self, filename):
+		if not self.crop_manifest:
+			with open(os.path.join(self.dirs["image_crops"], filename), "rb") as f:
+				return f.read()
+		_, buffer = cv2.imencode(
+			".jpg", self.read_pixels(filename), [cv2.IMWRITE_JPEG_QUALITY, 100]
+		)
+		return buffer.tobytes()
+
+	def read_size(self, filename):
+		if not self.crop_manifest:
+			path = os.path.join(self.dirs["image_crops"], filename)
+			image = iio.improps(path, extension=os.path.splitext(filename)[1])
+			return image.shape[:2]
+		_, (x_min, y_min, x_max, y_max) = self.get_region(filename)
+		return y_max - y_min, x_max - x_min
+
+
+def get_crops_parameters(
+	crop_manifest,
+	crop_suffix_length,
+	height_range,
+	margin,
+	max_distance,
+	output_image_extension,
+	reading_direction,
+	tile_height,
+	tile_overlap,
+):
+	return {
+		"crop_manifest": crop_manifest,
+		"crop_suffix_length": crop_suffix_length,
+		"height_range": height_range,
+		"margin": margin,
+		"max_distance": max_distance,
+		"output_image_extension": output_image_extension,
+		"reading_direction": reading_direction,
+		"tile_height": tile_height,
+		"tile_overlap": tile_overlap,
+	}
+
+
+def is_page_crop(basenames, crop_suffix_length, filename):
+	stem = os.path.splitext(filename)[0]
+	return (
+		stem[:-crop_suffix_length] in basenames
+		and stem[-crop_suffix_length:].isdigit()
+	)
+
+
+def remove_page_crops(basenames, crop_suffix_length, crops_dir):
+	for filename in os.listdir(crops_dir):
+		if is_page_crop(basenames, crop_suffix_length, filename):
+			os.remove(os.path.join(crops_dir, filename))
+
+
+def remove_page_outputs(basenames, crop_suffix_length, dirs, store):
+	for name in ("image_crops", "image_text", "image_audio", "image_audio_resized"):
+		remove_page_crops(basenames, crop_suffix_length, dirs[name])
+	remove_metadata(
+		[
+			key
+			for key in read_metadata(store, "durations")
+			if is_page_crop(basenames, crop_suffix_length, key)
+		],
+		store,
+		"durations",
+	)
+
+
 def crops(
+	build_state_filename,
+	crop_manifest,
+	crop_manifest_filename,
 	crop_suffix_length,
+	debug_artifacts,
+	detection_server,
 	dirs,
 	height_range,
+	legacy_metadata_dirs,
 	margin,
 	max_distance,
 	merged_gaps_filename,
+	metadata_filename,
 	output_image_extension,
+	reading_direction,
+	tile_height,
+	tile_overlap,
 	total_gaps_filename,
 	workers_config,
 ):
@@ -557,29 +1442,87 @@ def crops(
 			if f.lower().endswith(output_image_extension)
 		]
 	)
-	workers = min(workers_config, cpu_count())
-	batches = split_batches(images, workers)
-	with Pool(processes=workers) as pool:
-		args = [
+	state_path = os.path.join(dirs["merge"], build_state_filename)
+	state = load_json_dict(state_path)
+	parameters = get_crops_parameters(
+		crop_manifest,
+		crop_suffix_length,
+		height_range,
+		margin,
+		max_distance,
+		output_image_extension,
+		reading_direction,
+		tile_height,
+		tile_overlap,
+	)
+	metadata_path = os.path.join(dirs["merge"], metadata_filename)
+	store = open_metadata_store(metadata_path)
+	import_legacy_metadata(legacy_metadata_dirs, store)
+	stale = filter_stale_outputs(
+		functools.partial(has_metadata, store, "gaps"),
+		images,
+		dirs["image_resized"],
+		parameters,
+		state,
+		"crops",
+	)
+	if stale:
+		changed = filter_changed(
+			stale, dirs["image_resized"], parameters, state, "crops"
+		)
+		remove_metadata(stale, store, "gaps")
+		remove_outputs(stale, dirs["image_regions"], ".json")
+		remove_page_outputs(
+			{os.path.splitext(f)[0] for f in changed}, crop_suffix_length, dirs, store
+		)
+		workers = min(workers_config, cpu_count())
+		detection_address = None
+		if detection_server:
+			detection_address, detection_process = start_detection_server()
+		tasks = [
 			(
-				batch,
-				crop_suffix_length,
-				height_range,
-				dirs["image_resized"],
-				margin,
-				max_distance,
-				dirs["image_boxed"],
-				dirs["image_crops"],
-				dirs["image_gaps"],
-				dirs["image_grouped"],
-				output_image_extension,
+				filename,
+				(
+					crop_manifest,
+					crop_suffix_length,
+					debug_artifacts,
+					detection_address,
+					filename,
+					height_range,
+					dirs["image_resized"],
+					margin,
+					max_distance,
+					metadata_path,
+					dirs["image_boxed"],
+					dirs["image_crops"],
+					dirs["image_grouped"],
+					dirs["image_regions"],
+					output_image_extension,
+					reading_direction,
+					tile_height,
+					tile_overlap,
+				),
 			)
-			for batch in batches
+			for filename in stale
 		]
-		pool.starmap_async(batch_detect_images, args).get()
-	merge_gaps_json(
-		dirs["image_gaps"], merged_gaps_filename, dirs["merge"], total_gaps_filename
+		try:
+			run_tasks(detect_page, {}, "crops", tasks, workers)
+		finally:
+			if detection_server:
+				stop_detection_server(detection_address, detection_process)
+	record_build_outputs(
+		functools.partial(has_metadata, store, "gaps"),
+		images,
+		dirs["image_resized"],
+		parameters,
+		state,
+		"crops",
 	)
+	save_json_dict(state, state_path)
+	merge_gaps_json(merged_gaps_filename, dirs["merge"], store, total_gaps_filename)
+	store.close()
+	if crop_manifest:
+		merge_regions_json(crop_manifest_filename, dirs["image_regions"], dirs["merge"])
 
 
 def parse_json_text(string):
@@ -612,12 +1555,251 @@ def is_valid_json(min_size, path):
 		return False
 
 
-def image_to_text(
+class RateLimiter:
+	def __init__(self, max_concurrency, requests_per_minute, tokens_per_minute):
+		self.lock = multiprocessing.Lock()
+		self.max_concurrency = max_concurrency
+		self.requests_per_minute = requests_per_minute
+		self.tokens_per_minute = tokens_per_minute
+		self.values = multiprocessing.RawArray(
+			"d",
+			[
+				requests_per_minute,
+				tokens_per_minute,
+				time.time(),
+				0.0,
+				max_concurrency,
+				0.0,
+			],
+		)
+
+	def refill(self, now):
+		elapsed = now - self.values[2]
+		self.values[2] = now
+		if self.requests_per_minute:
+			self.values[0] = min(
+				self.requests_per_minute,
+				self.values[0] + elapsed * self.requests_per_minute / 60,
+			)
+		if self.tokens_per_minute:
+			self.values[1] = min(
+				self.tokens_per_minute,
+				self.values[1] + elapsed * self.tokens_per_minute / 60,
+			)
+
+	def try_acquire(self, tokens):
+		with self.lock:
+			now = time.time()
+			self.refill(now)
+			if self.values[3] > now:
+				return self.values[3] - now
+			if self.values[5] >= int(self.values[4]):
+				return 0.05
+			wait = 0.0
+			if self.requests_per_minute and self.values[0] < 1:
+				wait = (1 - self.values[0]) * 60 / self.requests_per_minute
+			if self.tokens_per_minute:
+				needed = min(tokens, self.tokens_per_minute)
+				if self.values[1] < needed:
+					wait = max(
+						wait, (needed - self.values[1]) * 60 / self.tokens_per_minute
+					)
+			if wait > 0:
+				return wait
+			self.values[0] -= 1 if self.requests_per_minute else 0
+			self.values[1] -= tokens if self.tokens_per_minute else 0
+			self.values[5] += 1
+			return 0.0
+
+	def acquire(self, tokens):
+		wait = self.try_acquire(tokens)
+		while wait > 0:
+			time.sleep(min(wait, 1.0))
+			wait = self.try_acquire(tokens)
+
+	async def async_acquire(self, tokens):
+		wait = self.try_acquire(tokens)
+		while wait > 0:
+			await asyncio.sleep(min(wait, 1.0))
+			wait = self.try_acquire(tokens)
+
+	def release(self, retry_after, status, tokens_delta):
+		with self.lock:
+			now = time.time()
+			self.values[5] = max(0.0, self.values[5] - 1)
+			if status == 429 or (status is not None and status >= 500):
+				self.values[4] = max(1.0, self.values[4] / 2)
+				if retry_after > 0:
+					self.values[3] = max(self.values[3], now + retry_after)
+			elif status == 200:
+				self.values[4] = min(
+					self.max_concurrency, self.values[4] + 1 / self.values[4]
+				)
+			if self.tokens_per_minute and tokens_delta:
+				self.values[1] -= tokens_delta
+
+
+RATE_LIMITERS = {}
+
+
+def create_rate_limiters(api_limits, max_concurrency):
+	return {
+		endpoint: RateLimiter(max_concurrency, requests_per_minute, tokens_per_minute)
+		for endpoint, (requests_per_minute, tokens_per_minute) in api_limits.items()
+	}
+
+
+def init_rate_limiters(rate_limiters):
+	RATE_LIMITERS.update(rate_limiters)
+
+
+def get_rate_limiter(endpoint):
+	if endpoint not in RATE_LIMITERS:
+		RATE_LIMITERS[endpoint] = RateLimiter(1000000, 0, 0)
+	return RATE_LIMITERS[endpoint]
+
+
+def get_retry_after(headers):
+	value = headers.get("Retry-After")
+	if not value:
+		return 0.0
+	try:
+		return max(0.0, float(value))
+	except ValueError:
+		pass
+	try:
+		date = email.utils.parsedate_to_datetime(value)
+		return max(0.0, date.timestamp() - time.time())
+	except:
+		return 0.0
+
+
+def get_retry_delay(attempt, pause, retry_after):
+	if retry_after > 0:
+		return retry_after
+	return pause * (2**attempt) * random.uniform(0.5, 1.5)
+
+
+def estimate_text_tokens(count, prompt):
+	return len(prompt) // 4 + 160 * count
+
+
+def build_text_request(api_key, images, max_tokens, model, prompt, temperature):
+	content = [{"type": "text", "text": prompt}]
+	for i, image in enumerate(images):
+		image_base64 = base64.b64encode(image).decode()
+		if len(images) > 1:
+			content.append({"type": "text", "text": f"Image {i + 1}"})
+		content.append(
+			{
+				"type": "image_url",
+				"image_url": {"url": f"data:image/jpeg;base64,{image_base64}"},
+			}
+		)
+	headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
+	payload = {
+		"max_tokens": max_tokens,
+		"model": model,
+		"messages": [{"role": "user", "content": content}],
+		"seed": 42,
+		"temperature": temperature,
+	}
+	return headers, payload
+
+
+def parse_text_content(content, min_size):
+	start = content.find("[")
+	end = content.rfind("]") + 1
+	if start < 0 or end <= start:
+		return None
+	parsed = parse_json_text(content[start:end])
+	if (
+		parsed
+		and len(str(parsed)) >= min_size
+		and isinstance(parsed, list)
+		and all(isinstance(item, dict) for item in parsed)
+	):
+		return parsed
+	return None
+
+
+def parse_batch_text_content(content, count, min_size):
+	start = content.find("[")
+	end = content.rfind("]") + 1
+	if start < 0 or end <= start:
+		return None
+	parsed = parse_json_text(content[start:end])
+	if not isinstance(parsed, list):
+		return None
+	results = {}
+	for item in parsed:
+		if not isinstance(item, dict):
+			continue
+		try:
+			index = int(item.get("image"))
+		except:
+			continue
+		if 1 <= index <= count:
+			results.setdefault(index, []).append({"text": item.get("text", "")})
+	results = {i: items for i, items in results.items() if len(str(items)) >= min_size}
+	return results or None
+
+
+async def request_text(
+	api_endpoint,
+	attempt,
+	headers,
+	parse,
+	pause,
+	payload,
+	retries,
+	semaphore,
+	session,
+	temperature,
+	temperature_step,
+	tokens,
+):
+	rate_limiter = get_rate_limiter(api_endpoint)
+	current_temperature = temperature
+	for current_attempt in range(attempt, retries):
+		retry_after = 0.0
+		status = None
+		tokens_delta = 0
+		parsed = None
+		async with semaphore:
+			await rate_limiter.async_acquire(tokens)
+			try:
+				payload["temperature"] = current_temperature
+				async with session.post(
+					api_endpoint, headers=headers, json=payload
+				) as response:
+					status = response.status
+					retry_after = get_retry_after(response.headers)
+					if status == 200:
+						data = await response.json(content_type=None)
+						usage = data.get("usage") or {}
+						tokens_delta = usage.get("total_tokens", tokens) - tokens
+						content = data["choices"][0]["message"]["content"]
+						parsed = parse(content)
+			except:
+				pass
+			rate_limiter.release(retry_after, status, tokens_delta)
+		if parsed:
+			return parsed
+		if current_attempt < retries - 1:
+			sleep_time = get_retry_delay(current_attempt, pause, retry_after)
+			current_temperature += temperature_step
+			await asyncio.sleep(sleep_time)
+	return None
+
+
+async def image_to_text(
 	api_endpoint,
 	api_key,
 	attempt,
+	cache,
+	crop_reader,
 	filename,
-	input_dir,
 	max_tokens,
 	min_size,
 	model,
@@ -625,76 +1807,56 @@ def image_to_text(
 	pause,
 	prompt,
 	retries,
+	semaphore,
+	session,
 	temperature,
 	temperature_step,
 ):
 	basename = os.path.splitext(filename)[0]
-	path = os.path.join(input_dir, filename)
 	text_filename = f"{basename}.json"
 	text_path = os.path.join(output_dir, text_filename)
 	if is_valid_json(min_size, text_path):
 		return
-	with open(path, "rb") as f:
-		image_base64 = base64.b64encode(f.read()).decode()
-	headers = {"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"}
-	payload = {
-		"max_tokens": max_tokens,
-		"model": model,
-		"messages": [
-			{
-				"role": "user",
-				"content": [
-					{"type": "text", "text": prompt},
-					{
-						"type": "image_url",
-						"image_url": {"url": f"data:image/jpeg;base64,{image_base64}"},
-					},
-				],
-			}
-		],
-		"seed": 42,
-		"temperature": temperature,
-	}
-	current_temperature = temperature
-	for current_attempt in range(attempt, retries):
-		try:
-			payload["temperature"] = current_temperature
-			response = requests.post(api_endpoint, headers=headers, json=payload)
-			if response.status_code == 200:
-				content = response.json()["choices"][0]["message"]["content"]
-				start = content.find("[")
-				end = content.rfind("]") + 1
-				if start >= 0 and end > start:
-					parsed = parse_json_text(content[start:end])
-					if (
-						parsed
-						and len(str(parsed)) >= min_size
-						and isinstance(parsed, list)
-						and all(isinstance(item, dict) for item in parsed)
-					):
-						with open(text_path, "w", encoding="utf-8") as f:
-							json.dump(
-								parsed,
-								f,
-								indent="\t",
-								ensure_ascii=False,
-								sort_keys=True,
-							)
-						return
-		except:
-			pass
-		if current_attempt < retries - 1:
-			sleep_time = pause * (2**current_attempt)
-			current_temperature += temperature_step
-			time.sleep(sleep_time)
+	(key,) = get_ocr_cache_keys(crop_reader, filename, model, [prompt])
+	cached = read_ocr_cache(cache, key)
+	if cached is not None:
+		save_json_dict(cached, text_path)
+		return
+	headers, payload = build_text_request(
+		api_key,
+		[crop_reader.read_bytes(filename)],
+		max_tokens,
+		model,
+		prompt,
+		temperature,
+	)
+	parsed = await request_text(
+		api_endpoint,
+		attempt,
+		headers,
+		functools.partial(parse_text_content, min_size=min_size),
+		pause,
+		payload,
+		retries,
+		semaphore,
+		session,
+		temperature,
+		temperature_step,
+		estimate_text_tokens(1, prompt),
+	)
+	if parsed:
+		save_json_dict(parsed, text_path)
+		write_ocr_cache(cache, key, parsed)
 
 
-def batch_image_to_text(
+async def crops_to_text(
 	api_endpoint,
 	api_key,
 	attempt,
-	batch,
-	input_dir,
+	batch_prompt,
+	cache,
+	crop_reader,
+	filenames,
 	max_tokens,
 	min_size,
 	model,
@@ -702,35 +1864,249 @@ def batch_image_to_text(
 	pause,
 	prompt,
 	retries,
+	semaphore,
+	session,
 	temperature,
 	temperature_step,
 ):
-	for filename in batch:
-		image_to_text(
-			api_endpoint,
+	pending = []
+	keys = {}
+	for filename in filenames:
+		text_path = os.path.join(output_dir, f"{os.path.splitext(filename)[0]}.json")
+		if is_valid_json(min_size, text_path):
+			continue
+		key, batch_key = get_ocr_cache_keys(
+			crop_reader, filename, model, [prompt, batch_prompt]
+		)
+		cached = read_ocr_cache(cache, key)
+		if cached is None and len(filenames) > 1:
+			cached = read_ocr_cache(cache, batch_key)
+		if cached is not None:
+			save_json_dict(cached, text_path)
+			continue
+		pending.append(filename)
+		keys[filename] = batch_key
+	if len(pending) > 1:
+		headers, payload = build_text_request(
 			api_key,
-			attempt,
-			filename,
-			input_dir,
+			[crop_reader.read_bytes(f) for f in pending],
 			max_tokens,
-			min_size,
 			model,
-			output_dir,
+			batch_prompt,
+			temperature,
+		)
+		parsed = await request_text(
+			api_endpoint,
+			attempt,
+			headers,
+			functools.partial(
+				parse_batch_text_content, count=len(pending), min_size=min_size
+			),
 			pause,
-			prompt,
+			payload,
 			retries,
+			semaphore,
+			session,
 			temperature,
 			temperature_step,
+			estimate_text_tokens(len(pending), batch_prompt),
+		)
+		for index, items in (parsed or {}).items():
+			filename = pending[index - 1]
+			basename = os.path.splitext(filename)[0]
+			save_json_dict(items, os.path.join(output_dir, f"{basename}.json"))
+			write_ocr_cache(cache, keys[filename], items)
+	await asyncio.gather(
+		*[
+			image_to_text(
+				api_endpoint,
+				api_key,
+				attempt,
+				cache,
+				crop_reader,
+				filename,
+				max_tokens,
+				min_size,
+				model,
+				output_dir,
+				pause,
+				prompt,
+				retries,
+				semaphore,
+				session,
+				temperature,
+				temperature_step,
+			)
+			for filename in pending
+		]
+	)
+
+
+def open_ocr_cache(path):
+	cache = sqlite3.connect(path, check_same_thread=False)
+	cache.execute("CREATE TABLE IF NOT EXISTS texts (key TEXT PRIMARY KEY, text TEXT)")
+	cache.commit()
+	return cache
+
+
+def get_ocr_cache_keys(crop_reader, filename, model, prompts):
+	image = crop_reader.read_pixels(filename)
+	digest = hashlib.sha256()
+	if image is None:
+		digest.update(crop_reader.read_bytes(filename))
+	else:
+		digest.update(str(image.shape).encode())
+		digest.update(image.tobytes())
+	keys = []
+	for prompt in prompts:
+		key = digest.copy()
+		key.update(get_digest({"model": model, "prompt": prompt}).encode())
+		keys.append(key.hexdigest())
+	return keys
+
+
+def read_ocr_cache(cache, key):
+	row = cache.execute("SELECT text FROM texts WHERE key = ?", (key,)).fetchone()
+	if row is None:
+		return None
+	return json.loads(row[0])
+
+
+def write_ocr_cache(cache, key, items):
+	cache.execute(
+		"INSERT OR REPLACE INTO texts (key, text) VALUES (?, ?)",
+		(key, json.dumps(items, ensure_ascii=False)),
+	)
+	cache.commit()
+
+
+def group_crops(batch_size, crop_suffix_length, filenames):
+	pages = {}
+	for filename in filenames:
+		stem = os.path.splitext(filename)[0]
+		pages.setdefault(stem[:-crop_suffix_length], []).append(filename)
+	size = max(1, batch_size)
+	groups = []
+	for page in sorted(pages):
+		crops = sorted(pages[page])
+		for i in range(0, len(crops), size):
+			groups.append(crops[i : i + size])
+	return groups
+
+
+async def open_text_session(concurrent_requests):
+	connector = aiohttp.TCPConnector(limit=concurrent_requests, keepalive_timeout=60)
+	session = aiohttp.ClientSession(connector=connector)
+	return session, asyncio.Semaphore(concurrent_requests)
+
+
+async def timed_coroutine(coroutine, item):
+	start_time = time.perf_counter()
+	await coroutine
+	return item, time.perf_counter() - start_time
+
+
+def catch_errors(errors, function):
+	def run(*args):
+		try:
+			function(*args)
+		except Exception as e:
+			errors.put(e)
+
+	return run
+
+
+def raise_errors(errors):
+	if not errors.empty():
+		raise errors.get()
+
+
+async def chain_coroutine(callback, coroutine):
+	await coroutine
+	callback()
+
+
+async def images_to_text(
+	api_endpoint,
+	api_key,
+	batch_prompt,
+	cache_path,
+	concurrent_requests,
+	crop_reader,
+	groups,
+	max_tokens,
+	min_size,
+	model,
+	output_dir,
+	pause,
+	prompt,
+	retries,
+	temperature,
+	temperature_step,
+):
+	cache = open_ocr_cache(cache_path)
+	session, semaphore = await open_text_session(concurrent_requests)
+	async with session:
+		results = await asyncio.gather(
+			*[
+				timed_coroutine(
+					crops_to_text(
+						api_endpoint,
+						api_key,
+						0,
+						batch_prompt,
+						cache,
+						crop_reader,
+						group,
+						max_tokens,
+						min_size,
+						model,
+						output_dir,
+						pause,
+						prompt,
+						retries,
+						semaphore,
+						session,
+						temperature,
+						temperature_step,
+					),
+					group[0],
+				)
+				for group in groups
+			]
 		)
+	cache.close()
+	return dict(results)
+
+
+def get_texts_parameters(
+	batch_prompt, batch_size, max_tokens, model, prompt, temperature
+):
+	return {
+		"batch_prompt": batch_prompt,
+		"batch_size": batch_size,
+		"max_tokens": max_tokens,
+		"model": model,
+		"prompt": prompt,
+		"temperature": temperature,
+	}
 
 
 def texts(
 	api_endpoints,
 	api_keys,
+	api_limits,
+	batch_prompt,
+	batch_size,
+	build_state_filename,
 	concurrent_requests,
+	crop_manifest,
+	crop_manifest_filename,
+	crop_suffix_length,
 	dirs,
 	max_tokens,
 	model,
+	ocr_cache_filename,
 	output_image_extension,
 	pause,
 	prompt,
@@ -739,23 +2115,36 @@ def texts(
 	temperature_step,
 	text_min_size,
 ):
-	images = sorted(
-		[
-			f
-			for f in os.listdir(dirs["image_crops"])
-			if f.lower().endswith(output_image_extension)
-		]
+	images = list_crops(
+		crop_manifest, crop_manifest_filename, dirs, output_image_extension
 	)
-	workers = min(concurrent_requests, 10 * cpu_count())
-	batches = split_batches(images, workers)
-	with Pool(processes=workers) as pool:
-		args = [
-			(
+	state_path = os.path.join(dirs["merge"], build_state_filename)
+	state = load_json_dict(state_path)
+	parameters = get_texts_parameters(
+		batch_prompt, batch_size, max_tokens, model, prompt, temperature
+	)
+	stale = filter_stale(
+		images,
+		dirs["image_crops"],
+		dirs["image_text"],
+		".json",
+		parameters,
+		state,
+		"texts",
+	)
+	if stale:
+		remove_outputs(stale, dirs["image_text"], ".json")
+		init_rate_limiters(create_rate_limiters(api_limits, concurrent_requests))
+		start_time = time.perf_counter()
+		timings = asyncio.run(
+			images_to_text(
 				api_endpoints[2],
 				api_keys[1],
-				0,
-				batch,
-				dirs["image_crops"],
+				batch_prompt,
+				os.path.join(dirs["merge"], ocr_cache_filename),
+				concurrent_requests,
+				CropReader(crop_manifest, crop_suffix_length, dirs),
+				group_crops(batch_size, crop_suffix_length, stale),
 				max_tokens,
 				text_min_size,
 				model,
@@ -766,14 +2155,29 @@ def texts(
 				temperature,
 				temperature_step,
 			)
-			for batch in batches
-		]
-		pool.starmap_async(batch_image_to_text, args).get()
+		)
+		report_timings(start_time, "texts", timings, concurrent_requests)
+	built = [
+		f
+		for f in images
+		if is_valid_json(
+			text_min_size,
+			os.path.join(dirs["image_text"], f"{os.path.splitext(f)[0]}.json"),
+		)
+	]
+	record_build(
+		built,
+		dirs["image_crops"],
+		dirs["image_text"],
+		".json",
+		parameters,
+		state,
+		"texts",
+	)
+	save_json_dict(state, state_path)
 
 
-def calculate_gemini_tokens(output_image_extension, path):
-	image = iio.improps(path, extension=output_image_extension)
-	height, width = image.shape[:2]
+def calculate_gemini_tokens(height, width):
 	if width <= 384 and height <= 384:
 		return 258
 	tile_size = 768
@@ -782,11 +2186,9 @@ def calculate_gemini_tokens(output_image_extension, path):
 	return tiles_x * tiles_y * 258
 
 
-def calculate_openai_tokens(low_resolution, output_image_extension, path):
+def calculate_openai_tokens(height, low_resolution, width):
 	if low_resolution:
 		return 85
-	image = iio.improps(path, extension=output_image_extension)
-	height, width = image.shape[:2]
 	tile_size = 512
 	tiles_x = -(-width // tile_size)
 	tiles_y = -(-height // tile_size)
@@ -794,6 +2196,7 @@ def calculate_openai_tokens(low_resolution, output_image_extension, path):
 
 
 def costs(
+	batch_size,
 	cost_deepinfra,
 	cost_filename,
 	cost_gemini,
@@ -801,18 +2204,18 @@ def costs(
 	cost_openai,
 	cost_openrouter,
 	cost_tts,
+	crop_manifest,
+	crop_manifest_filename,
+	crop_suffix_length,
 	dirs,
 	encoding_name,
 	max_tokens,
 	output_image_extension,
 ):
-	images = sorted(
-		[
-			f
-			for f in os.listdir(dirs["image_crops"])
-			if f.lower().endswith(output_image_extension)
-		]
+	images = list_crops(
+		crop_manifest, crop_manifest_filename, dirs, output_image_extension
 	)
+	crop_reader = CropReader(crop_manifest, crop_suffix_length, dirs)
 	texts = sorted(
 		[f for f in os.listdir(dirs["image_text"]) if f.lower().endswith(".json")]
 	)
@@ -823,15 +2226,11 @@ def costs(
 	token_count_openai = 48 * count
 	token_count_openrouter = 48 * count
 	for image in images:
-		image_path = os.path.join(dirs["image_crops"], image)
+		height, width = crop_reader.read_size(image)
 		token_count_deepinfra += 160
-		token_count_gemini += calculate_gemini_tokens(
-			output_image_extension, image_path
-		)
+		token_count_gemini += calculate_gemini_tokens(height, width)
 		token_count_groq += 6400
-		token_count_openai += calculate_openai_tokens(
-			False, output_image_extension, image_path
-		)
+		token_count_openai += calculate_openai_tokens(height, False, width)
 		token_count_openrouter += 256
 	extracted_text = ""
 	for text_file in texts:
@@ -840,7 +2239,22 @@ def costs(
 	character_count = len(extracted_text)
 	encoding = tiktoken.get_encoding(encoding_name)
 	output_token_count = int(len(encoding.encode(extracted_text)) * 1.5)
+	request_count = len(group_crops(batch_size, crop_suffix_length, images))
+	saved_requests = count - request_count
+	saved_tokens = 48 * saved_requests
 	cost_data = {
+		"batch": {
+			"requests": request_count,
+			"saved_requests": saved_requests,
+			"saved_input_tokens": saved_tokens,
+			"saved_input_cost": {
+				"deepinfra": round((cost_deepinfra[0] * saved_tokens) / 1000000, 4),
+				"gemini": round((cost_gemini[0] * saved_tokens) / 1000000, 4),
+				"groq": round((cost_groq[0] * saved_tokens) / 1000000, 4),
+				"openai": round((cost_openai[0] * saved_tokens) / 1000000, 4),
+				"openrouter": round((cost_openrouter[0] * saved_tokens) / 1000000, 4),
+			},
+		},
 		"count": count,
 		"deepinfra": {
 			"input_tokens": token_count_deepinfra,
@@ -946,10 +2360,120 @@ def is_valid_audio(min_size, path):
 	return os.path.exists(path) and os.stat(path).st_size >= min_size
 
 
+def normalize_tts_text(text):
+	return " ".join(text.split())
+
+
+def get_tts_cache_path(audio_output_extension, cache_dir, parameters, text):
+	digest = get_digest({"parameters": parameters, "text": normalize_tts_text(text)})
+	return os.path.join(cache_dir, f"{digest}{audio_output_extension}")
+
+
+def link_audio(destination, source):
+	try:
+		os.link(source, destination)
+	except OSError:
+		shutil.copyfile(source, destination)
+
+
+def fix_wav_header(path):
+	size = os.path.getsize(path)
+	with open(path, "r+b") as f:
+		header = f.read(12)
+		if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+			return
+		offset = 12
+		while offset + 8 <= size:
+			f.seek(offset)
+			chunk = f.read(8)
+			chunk_size = int.from_bytes(chunk[4:8], "little")
+			if chunk[:4] == b"data":
+				f.seek(offset + 4)
+				f.write((size - offset - 8).to_bytes(4, "little"))
+				break
+			offset += 8 + chunk_size + chunk_size % 2
+		f.seek(4)
+		f.write((size - 8).to_bytes(4, "little"))
+
+
+def save_response(chunk_size, path, response):
+	temp_path = f"{path}.part"
+	try:
+		with open(temp_path, "wb") as f:
+			for chunk in response.iter_content(chunk_size):
+				f.write(chunk)
+		if path.lower().endswith(".wav"):
+			fix_wav_header(temp_path)
+		os.replace(temp_path, path)
+	finally:
+		if os.path.exists(temp_path):
+			os.remove(temp_path)
+
+
+def read_tts_cache(audio_path, cache_path, min_size):
+	if not is_valid_audio(min_size, cache_path):
+		return False
+	link_audio(audio_path, cache_path)
+	return True
+
+
+def write_tts_cache(audio_path, cache_path, min_size):
+	if not is_valid_audio(min_size, audio_path) or os.path.exists(cache_path):
+		return
+	temp_path = f"{cache_path}.{os.getpid()}.tmp"
+	link_audio(temp_path, audio_path)
+	os.replace(temp_path, cache_path)
+
+
+@functools.lru_cache(maxsize=1)
+def load_fish_reference(reference_audio_path, reference_text_path, signature):
+	with open(reference_text_path, encoding="utf-8") as f:
+		reference_text = f.read().strip()
+	with open(reference_audio_path, "rb") as f:
+		reference_audio = f.read()
+	return (
+		base64.b64encode(reference_audio).decode(),
+		hashlib.sha256(reference_audio).hexdigest(),
+		reference_text,
+	)
+
+
+def get_fish_reference(reference_audio_path, reference_text_path):
+	signature = get_file_signature(reference_audio_path) + get_file_signature(
+		reference_text_path
+	)
+	return load_fish_reference(
+		reference_audio_path, reference_text_path, tuple(signature)
+	)
+
+
+def register_fish_reference(api_endpoint, reference_audio_path, reference_text_path):
+	_, reference_digest, reference_text = get_fish_reference(
+		reference_audio_path, reference_text_path
+	)
+	reference_id = f"reference-{reference_digest[:16]}"
+	url = f"{api_endpoint.rsplit('/', 1)[0]}/references/add"
+	try:
+		with open(reference_audio_path, "rb") as f:
+			response = requests.post(
+				url,
+				data={"id": reference_id, "text": reference_text},
+				files={"audio": (os.path.basename(reference_audio_path), f)},
+			)
+		if response.status_code in (200, 409):
+			return reference_id
+		print(f"Reference registration failed with status {response.status_code}")
+	except Exception as e:
+		print(f"Reference registration failed: {e}")
+	return None
+
+
 def fish_text_to_audio(
 	api_endpoint,
 	attempt,
 	audio_output_extension,
+	cache_dir,
+	chunk_size,
 	filename,
 	input_dir,
 	max_tokens,
@@ -957,8 +2481,10 @@ def fish_text_to_audio(
 	output_dir,
 	pause,
 	reference_audio_path,
+	reference_id,
 	reference_text_path,
 	retries,
+	streaming,
 	temperature,
 ):
 	basename = os.path.splitext(filename)[0]
@@ -970,12 +2496,25 @@ def fish_text_to_audio(
 	text = parse_text_json(max_tokens, path)
 	if len(text) == 0:
 		return
-	with open(reference_text_path, encoding="utf-8") as f:
-		reference_text = f.read().strip()
-	with open(reference_audio_path, "rb") as f:
-		reference_audio_base64 = base64.b64encode(f.read()).decode()
+	reference_audio_base64, reference_digest, reference_text = get_fish_reference(
+		reference_audio_path, reference_text_path
+	)
+	cache_path = get_tts_cache_path(
+		audio_output_extension,
+		cache_dir,
+		{
+			"engine": "fish",
+			"max_tokens": max_tokens,
+			"reference_audio": reference_digest,
+			"reference_text": reference_text,
+			"temperature": temperature,
+		},
+		text,
+	)
+	if read_tts_cache(audio_path, cache_path, min_size):
+		return
 	references = []
-	if reference_text and reference_audio_base64:
+	if not reference_id and reference_text and reference_audio_base64:
 		references.append({"audio": reference_audio_base64, "text": reference_text})
 	headers = {"Content-Type": "application/json"}
 	payload = {
@@ -983,100 +2522,152 @@ def fish_text_to_audio(
 		"format": "wav",
 		"max_new_tokens": max_tokens,
 		"normalize": True,
-		"reference_id": None,
+		"reference_id": reference_id,
 		"references": references,
 		"seed": 42,
-		"streaming": False,
+		"streaming": streaming,
 		"temperature": temperature,
 		"text": text,
 		"use_memory_cache": "on",
 	}
+	rate_limiter = get_rate_limiter(api_endpoint)
 	for current_attempt in range(attempt, retries):
+		retry_after = 0.0
+		status = None
+		rate_limiter.acquire(len(text))
 		try:
-			response = requests.post(api_endpoint, headers=headers, json=payload)
-			if response.status_code == 200:
-				with open(audio_path, "wb") as f:
-					f.write(response.content)
-				if is_valid_audio(min_size, audio_path):
-					return
+			with requests.post(
+				api_endpoint, headers=headers, json=payload, stream=True
+			) as response:
+				status = response.status_code
+				retry_after = get_retry_after(response.headers)
+				if status == 200:
+					save_response(chunk_size, audio_path, response)
 		except:
 			pass
+		rate_limiter.release(retry_after, status, 0)
+		if is_valid_audio(min_size, audio_path):
+			write_tts_cache(audio_path, cache_path, min_size)
+			return
 		if current_attempt < retries - 1:
-			sleep_time = pause * (2**current_attempt)
+			sleep_time = get_retry_delay(current_attempt, pause, retry_after)
 			time.sleep(sleep_time)
 
 
-def batch_fish_text_to_audio(
-	api_endpoint,
-	attempt,
-	audio_output_extension,
-	batch,
-	input_dir,
-	max_tokens,
-	min_size,
-	output_dir,
-	pause,
-	reference_audio_path,
-	reference_text_path,
-	retries,
-	temperature,
-):
-	for filename in batch:
-		fish_text_to_audio(
-			api_endpoint,
-			attempt,
-			audio_output_extension,
-			filename,
-			input_dir,
-			max_tokens,
-			min_size,
-			output_dir,
-			pause,
-			reference_audio_path,
-			reference_text_path,
-			retries,
-			temperature,
-		)
+def get_fish_parameters(fish_temperature, max_tokens, reference_audio, reference_text):
+	return {
+		"fish_temperature": fish_temperature,
+		"max_tokens": max_tokens,
+		"reference_audio": get_build_signature("", reference_audio),
+		"reference_text": get_build_signature("", reference_text),
+	}
 
 
 def fish_tts(
 	api_endpoints,
+	api_limits,
 	audio_min_size,
 	audio_output_extension,
+	build_state_filename,
 	dirs,
+	fish_streaming,
 	fish_temperature,
 	max_tokens,
 	pause,
 	reference_audio,
 	reference_text,
+	register_reference,
 	retries,
+	tts_chunk_size,
 	workers_config,
 ):
 	texts = sorted(
 		[f for f in os.listdir(dirs["image_text"]) if f.lower().endswith(".json")]
 	)
-	workers = min(workers_config, cpu_count())
-	batches = split_batches(texts, workers)
-	with Pool(processes=workers) as pool:
-		args = [
+	state_path = os.path.join(dirs["merge"], build_state_filename)
+	state = load_json_dict(state_path)
+	parameters = get_fish_parameters(
+		fish_temperature, max_tokens, reference_audio, reference_text
+	)
+	stale = filter_stale(
+		texts,
+		dirs["image_text"],
+		dirs["image_audio"],
+		audio_output_extension,
+		parameters,
+		state,
+		"fish_tts",
+	)
+	if stale:
+		remove_outputs(stale, dirs["image_audio"], audio_output_extension)
+		reference_id = None
+		if register_reference:
+			reference_id = register_fish_reference(
+				api_endpoints[0], reference_audio, reference_text
+			)
+		workers = min(workers_config, cpu_count())
+		rate_limiters = create_rate_limiters(api_limits, workers)
+		tasks = [
 			(
-				api_endpoints[0],
-				0,
-				audio_output_extension,
-				batch,
-				dirs["image_text"],
-				max_tokens,
-				audio_min_size,
-				dirs["image_audio"],
-				pause,
-				reference_audio,
-				reference_text,
-				retries,
-				fish_temperature,
+				filename,
+				(
+					api_endpoints[0],
+					0,
+					audio_output_extension,
+					dirs["tts_cache"],
+					tts_chunk_size,
+					filename,
+					dirs["image_text"],
+					max_tokens,
+					audio_min_size,
+					dirs["image_audio"],
+					pause,
+					reference_audio,
+					reference_id,
+					reference_text,
+					retries,
+					fish_streaming,
+					fish_temperature,
+				),
 			)
-			for batch in batches
+			for filename in stale
 		]
-		pool.starmap_async(batch_fish_text_to_audio, args).get()
+		run_tasks(fish_text_to_audio, rate_limiters, "fish_tts", tasks, workers)
+	record_tts_build(
+		audio_min_size,
+		audio_output_extension,
+		dirs,
+		parameters,
+		state,
+		"fish_tts",
+		texts,
+	)
+	save_json_dict(state, state_path)
+
+
+def record_tts_build(
+	audio_min_size, audio_output_extension, dirs, parameters, state, step, texts
+):
+	built = [
+		f
+		for f in texts
+		if is_valid_audio(
+			audio_min_size,
+			os.path.join(
+				dirs["image_audio"],
+				f"{os.path.splitext(f)[0]}{audio_output_extension}",
+			),
+		)
+	]
+	record_build(
+		built,
+		dirs["image_text"],
+		dirs["image_audio"],
+		audio_output_extension,
+		parameters,
+		state,
+		step,
+	)
 
 
 def openai_text_to_audio(
@@ -1084,6 +2675,8 @@ def openai_text_to_audio(
 	api_key,
 	attempt,
 	audio_output_extension,
+	cache_dir,
+	chunk_size,
 	filename,
 	input_dir,
 	instructions,
@@ -1114,63 +2707,51 @@ def openai_text_to_audio(
 	}
 	if instructions:
 		payload["instructions"] = instructions
+	cache_path = get_tts_cache_path(
+		audio_output_extension,
+		cache_dir,
+		{
+			"engine": "openai",
+			"instructions": instructions,
+			"model": model,
+			"response_format": response_format,
+			"voice": voice,
+		},
+		text,
+	)
+	if read_tts_cache(audio_path, cache_path, min_size):
+		return
+	rate_limiter = get_rate_limiter(api_endpoint)
 	for current_attempt in range(attempt, retries):
+		retry_after = 0.0
+		status = None
+		rate_limiter.acquire(len(text))
 		try:
-			response = requests.post(api_endpoint, headers=headers, json=payload)
-			if response.status_code == 200:
-				with open(audio_path, "wb") as f:
-					f.write(response.content)
-				if is_valid_audio(min_size, audio_path):
-					return
+			with requests.post(
+				api_endpoint, headers=headers, json=payload, stream=True
+			) as response:
+				status = response.status_code
+				retry_after = get_retry_after(response.headers)
+				if status == 200:
+					save_response(chunk_size, audio_path, response)
 		except:
 			pass
+		rate_limiter.release(retry_after, status, 0)
+		if is_valid_audio(min_size, audio_path):
+			write_tts_cache(audio_path, cache_path, min_size)
+			return
 		if current_attempt < retries - 1:
-			sleep_time = pause * (2**current_attempt)
+			sleep_time = get_retry_delay(current_attempt, pause, retry_after)
 			time.sleep(sleep_time)
 
 
-def batch_openai_text_to_audio(
-	api_endpoint,
-	api_key,
-	attempt,
-	audio_output_extension,
-	batch,
-	input_dir,
-	instructions,
-	max_tokens,
-	min_size,
-	model,
-	output_dir,
-	pause,
-	response_format,
-	retries,
-	voice,
-):
-	for filename in batch:
-		openai_text_to_audio(
-			api_endpoint,
-			api_key,
-			attempt,
-			audio_output_extension,
-			filename,
-			input_dir,
-			instructions,
-			max_tokens,
-			min_size,
-			model,
-			output_dir,
-			pause,
-			response_format,
-			retries,
-			voice,
-		)
-
-
 def openai_tts(
 	api_endpoints,
 	api_keys,
+	api_limits,
 	audio_min_size,
 	audio_output_extension,
+	build_state_filename,
 	dirs,
 	instructions,
 	max_tokens,
@@ -1178,39 +2759,143 @@ def openai_tts(
 	pause,
 	response_format,
 	retries,
+	tts_chunk_size,
 	voices,
 	workers_config,
 ):
 	texts = sorted(
 		[f for f in os.listdir(dirs["image_text"]) if f.lower().endswith(".json")]
 	)
-	workers = min(workers_config, cpu_count())
-	batches = split_batches(texts, workers)
-	with Pool(processes=workers) as pool:
-		args = [
+	state_path = os.path.join(dirs["merge"], build_state_filename)
+	state = load_json_dict(state_path)
+	parameters = {
+		"instructions": instructions[0],
+		"max_tokens": max_tokens,
+		"model": models[1],
+		"response_format": response_format[1],
+		"voice": voices[3],
+	}
+	stale = filter_stale(
+		texts,
+		dirs["image_text"],
+		dirs["image_audio"],
+		audio_output_extension,
+		parameters,
+		state,
+		"openai_tts",
+	)
+	if stale:
+		remove_outputs(stale, dirs["image_audio"], audio_output_extension)
+		workers = min(workers_config, cpu_count())
+		rate_limiters = create_rate_limiters(api_limits, workers)
+		tasks = [
 			(
-				api_endpoints[4],
-				api_keys[6],
-				0,
-				audio_output_extension,
-				batch,
-				dirs["image_text"],
-				instructions[0],
-				max_tokens,
-				audio_min_size,
-				models[1],
-				dirs["image_audio"],
-				pause,
-				response_format[1],
-				retries,
-				voices[3],
+				filename,
+				(
+					api_endpoints[4],
+					api_keys[6],
+					0,
+					audio_output_extension,
+					dirs["tts_cache"],
+					tts_chunk_size,
+					filename,
+					dirs["image_text"],
+					instructions[0],
+					max_tokens,
+					audio_min_size,
+					models[1],
+					dirs["image_audio"],
+					pause,
+					response_format[1],
+					retries,
+					voices[3],
+				),
 			)
-			for batch in batches
+			for filename in stale
 		]
-		pool.starmap_async(batch_openai_text_to_audio, args).get()
+		run_tasks(
+			openai_text_to_audio, rate_limiters, "openai_tts", tasks, workers
+		)
+	record_tts_build(
+		audio_min_size,
+		audio_output_extension,
+		dirs,
+		parameters,
+		state,
+		"openai_tts",
+		texts,
+	)
+	save_json_dict(state, state_path)
+
+
+def read_wav(path):
+	try:
+		with wave.open(path, "rb") as f:
+			channels = f.getnchannels()
+			rate = f.getframerate()
+			width = f.getsampwidth()
+			data = f.readframes(f.getnframes())
+	except (EOFError, OSError, wave.Error):
+		return None, 0
+	if width == 1:
+		samples = (np.frombuffer(data, np.uint8).astype(np.float32) - 128) / 128
+	elif width == 2:
+		samples = np.frombuffer(data, "<i2").astype(np.float32) / 32768
+	elif width == 3:
+		raw = np.frombuffer(data[: len(data) // 3 * 3], np.uint8).reshape(-1, 3)
+		values = raw.astype(np.int32)
+		values = values[:, 0] | (values[:, 1] << 8) | (values[:, 2] << 16)
+		samples = (np.where(values >= 1 << 23, values - (1 << 24), values)).astype(
+			np.float32
+		) / (1 << 23)
+	elif width == 4:
+		samples = np.frombuffer(data, "<i4").astype(np.float32) / (1 << 31)
+	else:
+		return None, 0
+	samples = samples[: len(samples) // channels * channels]
+	return samples.reshape(-1, channels).mean(axis=1), rate
+
+
+def is_pcm_wav(path):
+	try:
+		with wave.open(path, "rb") as f:
+			return 1 <= f.getsampwidth() <= 4
+	except (EOFError, OSError, wave.Error):
+		return False
+
+
+def resample_audio(samples, source_rate, target_rate):
+	if source_rate == target_rate or len(samples) == 0:
+		return samples
+	count = int(round(len(samples) * target_rate / source_rate))
+	spectrum = np.fft.rfft(samples)
+	resized = np.zeros(count // 2 + 1, dtype=spectrum.dtype)
+	size = min(len(resized), len(spectrum))
+	resized[:size] = spectrum[:size]
+	return np.fft.irfft(resized, count) * (count / len(samples))
+
+
+def to_pcm16(samples):
+	return np.clip(np.round(samples * 32767), -32768, 32767).astype("<i2")
+
+
+def write_wav(path, sample_rate, samples):
+	data = to_pcm16(samples)
+	with wave.open(path, "wb") as f:
+		f.setnchannels(1)
+		f.setsampwidth(2)
+		f.setframerate(sample_rate)
+		f.writeframes(data.tobytes())
 
 
 def create_silence(duration, output_path, sample_rate):
+	if output_path.lower().endswith(".wav"):
+		write_wav(
+			output_path,
+			sample_rate,
+			np.zeros(int(round(duration * sample_rate)), np.float32),
+		)
+		return
 	cmd = [
 		"ffmpeg",
 		"-y",
@@ -1267,17 +2952,95 @@ def get_audio_duration(input_path):
 	]
 	try:
 		result = subprocess.check_output(cmd).decode().strip()
-		return float(result) if result else 0.0
-	except:
-		return 0.0
+		return float(result)
+	except (OSError, ValueError, subprocess.CalledProcessError) as e:
+		raise ValueError(f"ffprobe failed: {e}")
 
 
-def save_duration_json(basename, duration, output_dir):
-	output_path = os.path.join(output_dir, f"{basename}.json")
-	with open(output_path, "w") as f:
-		json.dump(
-			{basename: duration}, f, indent="\t", ensure_ascii=False, sort_keys=True
-		)
+def get_wav_duration(path):
+	size = os.path.getsize(path)
+	with open(path, "rb") as f:
+		header = f.read(12)
+		if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+			raise ValueError("not a RIFF/WAVE file")
+		byte_rate = 0
+		offset = 12
+		while offset + 8 <= size:
+			f.seek(offset)
+			chunk = f.read(8)
+			chunk_size = int.from_bytes(chunk[4:8], "little")
+			if chunk[:4] == b"fmt ":
+				fmt = f.read(16)
+				if len(fmt) < 16:
+					raise ValueError("truncated fmt chunk")
+				byte_rate = int.from_bytes(fmt[8:12], "little")
+			elif chunk[:4] == b"data":
+				if byte_rate == 0:
+					raise ValueError("missing fmt chunk")
+				return min(chunk_size, size - offset - 8) / byte_rate
+			offset += 8 + chunk_size + chunk_size % 2
+	raise ValueError("missing data chunk")
+
+
+def get_ogg_duration(path):
+	size = os.path.getsize(path)
+	with open(path, "rb") as f:
+		head = f.read(4096)
+		if head[:4] != b"OggS":
+			raise ValueError("not an Ogg file")
+		opus_index = head.find(b"OpusHead")
+		vorbis_index = head.find(b"\x01vorbis")
+		if opus_index >= 0:
+			pre_skip = int.from_bytes(head[opus_index + 10 : opus_index + 12], "little")
+			rate = 48000
+		elif vorbis_index >= 0:
+			pre_skip = 0
+			rate = int.from_bytes(head[vorbis_index + 12 : vorbis_index + 16], "little")
+		else:
+			raise ValueError("unsupported Ogg codec")
+		f.seek(max(0, size - 65536))
+		tail = f.read()
+	last = tail.rfind(b"OggS")
+	if last < 0 or last + 14 > len(tail) or rate == 0:
+		raise ValueError("missing final Ogg page")
+	granule = int.from_bytes(tail[last + 6 : last + 14], "little")
+	return max(0, granule - pre_skip) / rate
+
+
+def probe_audio_duration(path):
+	extension = os.path.splitext(path)[1].lower()
+	if extension == ".wav":
+		return get_wav_duration(path)
+	if extension in (".oga", ".ogg", ".opus"):
+		return get_ogg_duration(path)
+	return get_audio_duration(path)
+
+
+def probe_audio_durations(index, paths):
+	durations = {}
+	errors = {}
+	for path in paths:
+		try:
+			signature = get_file_signature(path)
+			entry = index.get(path)
+			if entry and entry[:2] == signature:
+				durations[path] = entry[2]
+				continue
+			duration = probe_audio_duration(path)
+		except (OSError, ValueError) as e:
+			errors[path] = str(e)
+			continue
+		index[path] = signature + [duration]
+		durations[path] = duration
+	return durations, errors
+
+
+def save_durations(durations, store):
+	store.executemany(
+		"INSERT OR REPLACE INTO durations (key, value) VALUES (?, ?)",
+		list(durations.items()),
+	)
+	store.commit()
 
 
 def copy_audio(input_path, output_path, sample_rate):
@@ -1304,15 +3067,45 @@ def set_audio_duration(
 	audio_output_extension,
 	filename,
 	input_dir,
-	output_dir,
+	metadata_path,
 	resized_dir,
 	sample_rate,
+	single_pass,
 	target_duration,
 ):
+	store = get_metadata_store(metadata_path)
 	input_path = os.path.join(input_dir, filename)
 	basename = os.path.splitext(filename)[0]
 	resized_path = os.path.join(resized_dir, f"{basename}{audio_output_extension}")
-	duration = get_audio_duration(input_path)
+	if single_pass and is_pcm_wav(input_path):
+		try:
+			duration = probe_audio_duration(input_path)
+			save_durations({basename: max(duration, target_duration)}, store)
+			return
+		except (OSError, ValueError) as e:
+			print(f"Duration probe failed for {input_path}: {e}")
+	samples, rate = None, 0
+	if resized_path.lower().endswith(".wav"):
+		if not os.path.exists(input_path):
+			samples, rate = np.zeros(0, np.float32), sample_rate
+		elif input_path.lower().endswith(".wav"):
+			samples, rate = read_wav(input_path)
+	if samples is not None:
+		duration = len(samples) / rate if rate else 0.0
+		if not single_pass:
+			samples = resample_audio(samples, rate, sample_rate)
+			count = int(round(target_duration * sample_rate))
+			if len(samples) < count:
+				samples = np.pad(samples, (0, count - len(samples)))
+			write_wav(resized_path, sample_rate, samples)
+		save_durations({basename: max(duration, target_duration)}, store)
+		return
+	duration = 0.0
+	if os.path.exists(input_path):
+		try:
+			duration = get_audio_duration(input_path)
+		except ValueError as e:
+			print(f"Replacing {input_path} with silence: {e}")
 	if 0 < duration < target_duration:
 		extend_silence(
 			target_duration - duration, input_path, resized_path, sample_rate
@@ -1323,37 +3116,52 @@ def set_audio_duration(
 	else:
 		create_silence(target_duration, resized_path, sample_rate)
 		duration = target_duration
-	save_duration_json(basename, duration, output_dir)
+	save_durations({basename: duration}, store)
 
 
-def batch_set_audio_duration(
-	audio_output_extension,
-	batch,
-	input_dir,
-	output_dir,
-	resized_dir,
-	sample_rate,
-	target_duration,
+def record_probed_durations(
+	audio_index_filename, dirs, filenames, store, target_duration
 ):
-	for filename in batch:
-		set_audio_duration(
-			audio_output_extension,
-			filename,
-			input_dir,
-			output_dir,
-			resized_dir,
-			sample_rate,
-			target_duration,
+	index_path = os.path.join(dirs["merge"], audio_index_filename)
+	index = load_json_dict(index_path)
+	paths = {f: os.path.join(dirs["image_audio"], f) for f in filenames}
+	undecodable = {
+		path for path in paths.values() if os.path.exists(path) and not is_pcm_wav(path)
+	}
+	durations, errors = probe_audio_durations(
+		index,
+		[
+			path
+			for path in paths.values()
+			if os.path.exists(path) and path not in undecodable
+		],
+	)
+	save_json_dict(index, index_path)
+	remaining = []
+	probed = {}
+	for filename, path in paths.items():
+		if path in undecodable:
+			remaining.append(filename)
+			continue
+		if path in errors:
+			print(f"Duration probe failed for {path}: {errors[path]}")
+			remaining.append(filename)
+			continue
+		probed[os.path.splitext(filename)[0]] = max(
+			durations.get(path, 0.0), target_duration
 		)
+	save_durations(probed, store)
+	return remaining
 
 
 def create_transition_files(
 	audio_output_extension,
 	audios,
-	duration_dir,
 	prefix_length,
 	resized_dir,
 	sample_rate,
+	single_pass,
+	store,
 	transition_duration,
 	transition_suffix,
 ):
@@ -1366,8 +3174,9 @@ def create_transition_files(
 			basename = f"{previous_prefix}{transition_suffix}"
 			output_filename = f"{basename}{audio_output_extension}"
 			transition_path = os.path.join(resized_dir, output_filename)
-			create_silence(transition_duration, transition_path, sample_rate)
-			save_duration_json(basename, transition_duration, duration_dir)
+			if not single_pass:
+				create_silence(transition_duration, transition_path, sample_rate)
+			save_durations({basename: transition_duration}, store)
 		previous_prefix = current_prefix
 
 
@@ -1376,10 +3185,11 @@ def create_delay(
 	audios,
 	delay_duration,
 	delay_suffix,
-	duration_dir,
 	prefix_length,
 	resized_dir,
 	sample_rate,
+	single_pass,
+	store,
 ):
 	if delay_duration == 0 or not audios:
 		return
@@ -1387,18 +3197,13 @@ def create_delay(
 	basename = f"{filename[:prefix_length]}{delay_suffix}"
 	output_filename = f"{basename}{audio_output_extension}"
 	delay_path = os.path.join(resized_dir, output_filename)
-	create_silence(delay_duration, delay_path, sample_rate)
-	save_duration_json(basename, delay_duration, duration_dir)
+	if not single_pass:
+		create_silence(delay_duration, delay_path, sample_rate)
+	save_durations({basename: delay_duration}, store)
 
 
-def merge_duration_json(input_dir, merged_durations_filename, output_dir):
-	durations = {}
-	files = [f for f in os.listdir(input_dir) if f.endswith(".json")]
-	for filename in files:
-		path = os.path.join(input_dir, filename)
-		with open(path) as f:
-			duration_data = json.load(f)
-			durations.update(duration_data)
+def merge_duration_json(merged_durations_filename, output_dir, store):
+	durations = read_metadata(store, "durations")
 	path = os.path.join(output_dir, merged_durations_filename)
 	with open(path, "w") as f:
 		json.dump(durations, f, indent="\t", ensure_ascii=False, sort_keys=True)
@@ -1437,13 +3242,69 @@ def render_audio(
 		"-loglevel",
 		"error",
 		"-f",
-		"concat",
-		"-safe",
-		"0",
-		"-i",
-		path_input,
+		"concat",
+		"-safe",
+		"0",
+		"-i",
+		path_input,
+		"-ar",
+		str(sample_rate),
+		"-c:a",
+		"libopus",
+		"-vbr",
+		"on",
+		"-compression_level",
+		"10",
+		"-frame_duration",
+		"60",
+		path_render,
+	]
+	subprocess.run(cmd)
+
+
+def read_audio_clip(dirs, filename, sample_rate):
+	for directory in (dirs["image_audio"], dirs["image_audio_resized"]):
+		path = os.path.join(directory, filename)
+		if os.path.exists(path):
+			samples, rate = read_wav(path)
+			if samples is not None:
+				return resample_audio(samples, rate, sample_rate)
+	return None
+
+
+def render_audio_buffer(audio_filename, audios, dirs, durations, sample_rate):
+	counts = [
+		int(round(durations.get(os.path.splitext(f)[0], 0) * sample_rate))
+		for f in audios
+	]
+	offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+	buffer_path = os.path.join(
+		dirs["temp"], f"{os.path.splitext(audio_filename)[0]}.pcm"
+	)
+	buffer = np.memmap(
+		buffer_path, dtype="<i2", mode="w+", shape=(max(1, int(offsets[-1])),)
+	)
+	for filename, count, offset in zip(audios, counts, offsets):
+		samples = read_audio_clip(dirs, filename, sample_rate)
+		if samples is None or count == 0:
+			continue
+		samples = samples[:count]
+		buffer[offset : offset + len(samples)] = to_pcm16(samples)
+	path_render = os.path.join(dirs["render"], audio_filename)
+	cmd = [
+		"ffmpeg",
+		"-y",
+		"-hide_banner",
+		"-loglevel",
+		"error",
+		"-f",
+		"s16le",
 		"-ar",
 		str(sample_rate),
+		"-ac",
+		"1",
+		"-i",
+		"pipe:0",
 		"-c:a",
 		"libopus",
 		"-vbr",
@@ -1454,109 +3315,638 @@ def render_audio(
 		"60",
 		path_render,
 	]
-	subprocess.run(cmd)
+	process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+	try:
+		for i in range(0, int(offsets[-1]), 1048576):
+			process.stdin.write(buffer[i : i + 1048576].tobytes())
+	except BrokenPipeError:
+		pass
+	process.stdin.close()
+	process.wait()
+	del buffer
+	os.remove(buffer_path)
+
+
+def list_audio_clips(audio_output_extension, dirs, single_pass, store):
+	if single_pass:
+		return sorted(
+			[
+				f"{key}{audio_output_extension}"
+				for key in read_metadata(store, "durations")
+			]
+		)
+	return sorted(
+		[
+			f
+			for f in os.listdir(dirs["image_audio_resized"])
+			if f.lower().endswith(audio_output_extension)
+		]
+	)
 
 
-def audio(
+def finish_audio(
 	audio_concat_list_filename,
 	audio_delay_duration,
 	audio_filename,
 	audio_output_extension,
-	audio_target_segment_duration,
+	audio_single_pass,
 	audio_transition_duration,
 	delay_suffix,
 	dirs,
+	initial_audios,
 	merged_durations_filename,
-	output_image_extension,
 	prefix_length,
 	sample_rate,
+	state,
+	state_path,
+	store,
 	total_duration_filename,
 	transition_suffix,
-	workers_config,
 ):
-	initial_audios = sorted(
-		[
-			f.replace(output_image_extension, audio_output_extension)
-			for f in os.listdir(dirs["image_crops"])
-			if f.lower().endswith(output_image_extension)
-		]
-	)
-	workers = min(workers_config, cpu_count())
-	batches = split_batches(initial_audios, workers)
-	with Pool(processes=workers) as pool:
-		args = [
-			(
-				audio_output_extension,
-				batch,
-				dirs["image_audio"],
-				dirs["image_durations"],
-				dirs["image_audio_resized"],
-				sample_rate,
-				audio_target_segment_duration,
-			)
-			for batch in batches
-		]
-		pool.starmap_async(batch_set_audio_duration, args).get()
-	processed_audios = sorted(
-		[
-			f
-			for f in os.listdir(dirs["image_audio_resized"])
-			if f.lower().endswith(audio_output_extension)
-		]
+	processed_audios = list_audio_clips(
+		audio_output_extension, dirs, audio_single_pass, store
 	)
 	create_transition_files(
 		audio_output_extension,
 		processed_audios,
-		dirs["image_durations"],
 		prefix_length,
 		dirs["image_audio_resized"],
 		sample_rate,
+		audio_single_pass,
+		store,
 		audio_transition_duration,
 		transition_suffix,
 	)
-	audios_with_transitions = sorted(
-		[
-			f
-			for f in os.listdir(dirs["image_audio_resized"])
-			if f.lower().endswith(audio_output_extension)
-		]
+	audios_with_transitions = list_audio_clips(
+		audio_output_extension, dirs, audio_single_pass, store
 	)
 	create_delay(
 		audio_output_extension,
 		audios_with_transitions,
 		audio_delay_duration,
 		delay_suffix,
-		dirs["image_durations"],
 		prefix_length,
 		dirs["image_audio_resized"],
 		sample_rate,
+		audio_single_pass,
+		store,
 	)
-	merge_duration_json(
-		dirs["image_durations"], merged_durations_filename, dirs["merge"]
-	)
+	merge_duration_json(merged_durations_filename, dirs["merge"], store)
 	calculate_total_duration(
 		dirs["merge"], merged_durations_filename, total_duration_filename
 	)
-	final_audios = sorted(
+	final_audios = list_audio_clips(
+		audio_output_extension, dirs, audio_single_pass, store
+	)
+	if not audio_single_pass:
+		create_audio_list(
+			audio_concat_list_filename,
+			final_audios,
+			dirs["image_audio_resized"],
+			dirs["merge"],
+		)
+	with open(os.path.join(dirs["merge"], merged_durations_filename)) as f:
+		durations = json.load(f)
+	clip_dir = dirs["image_audio"] if audio_single_pass else dirs["image_audio_resized"]
+	clip_paths = [
+		os.path.join(clip_dir, f) for f in initial_audios if f in final_audios
+	]
+	render_parameters = {
+		"durations": durations,
+		"sample_rate": sample_rate,
+		"single_pass": audio_single_pass,
+	}
+	render_path = os.path.join(dirs["render"], audio_filename)
+	if is_step_stale(
+		clip_paths, [render_path], render_parameters, state, "render_audio"
+	):
+		if audio_single_pass:
+			render_audio_buffer(
+				audio_filename, final_audios, dirs, durations, sample_rate
+			)
+		else:
+			render_audio(
+				audio_filename,
+				audio_concat_list_filename,
+				dirs["merge"],
+				dirs["render"],
+				sample_rate,
+			)
+		record_step(clip_paths, render_parameters, state, "render_audio")
+		save_json_dict(state, state_path)
+
+
+def get_audio_parameters(sample_rate, single_pass, target_duration):
+	return {
+		"sample_rate": sample_rate,
+		"single_pass": single_pass,
+		"target_duration": target_duration,
+	}
+
+
+def audio(
+	audio_concat_list_filename,
+	audio_delay_duration,
+	audio_filename,
+	audio_index_filename,
+	audio_output_extension,
+	audio_single_pass,
+	audio_target_segment_duration,
+	audio_transition_duration,
+	build_state_filename,
+	crop_manifest,
+	crop_manifest_filename,
+	delay_suffix,
+	dirs,
+	legacy_metadata_dirs,
+	merged_durations_filename,
+	metadata_filename,
+	output_image_extension,
+	prefix_length,
+	sample_rate,
+	total_duration_filename,
+	transition_suffix,
+	workers_config,
+):
+	initial_audios = [
+		f.replace(output_image_extension, audio_output_extension)
+		for f in list_crops(
+			crop_manifest, crop_manifest_filename, dirs, output_image_extension
+		)
+	]
+	state_path = os.path.join(dirs["merge"], build_state_filename)
+	state = load_json_dict(state_path)
+	parameters = get_audio_parameters(
+		sample_rate, audio_single_pass, audio_target_segment_duration
+	)
+	metadata_path = os.path.join(dirs["merge"], metadata_filename)
+	store = open_metadata_store(metadata_path)
+	import_legacy_metadata(legacy_metadata_dirs, store)
+	stale = filter_stale_outputs(
+		functools.partial(has_metadata, store, "durations"),
+		initial_audios,
+		dirs["image_audio"],
+		parameters,
+		state,
+		"audio",
+	)
+	if stale and audio_single_pass:
+		stale = record_probed_durations(
+			audio_index_filename, dirs, stale, store, audio_target_segment_duration
+		)
+	if stale:
+		workers = min(workers_config, cpu_count())
+		tasks = [
+			(
+				filename,
+				(
+					audio_output_extension,
+					filename,
+					dirs["image_audio"],
+					metadata_path,
+					dirs["image_audio_resized"],
+					sample_rate,
+					audio_single_pass,
+					audio_target_segment_duration,
+				),
+			)
+			for filename in stale
+		]
+		run_tasks(set_audio_duration, {}, "audio", tasks, workers)
+	record_build_outputs(
+		functools.partial(has_metadata, store, "durations"),
+		initial_audios,
+		dirs["image_audio"],
+		parameters,
+		state,
+		"audio",
+	)
+	save_json_dict(state, state_path)
+	finish_audio(
+		audio_concat_list_filename,
+		audio_delay_duration,
+		audio_filename,
+		audio_output_extension,
+		audio_single_pass,
+		audio_transition_duration,
+		delay_suffix,
+		dirs,
+		initial_audios,
+		merged_durations_filename,
+		prefix_length,
+		sample_rate,
+		state,
+		state_path,
+		store,
+		total_duration_filename,
+		transition_suffix,
+	)
+	store.close()
+
+
+def pipeline(
+	api_endpoints,
+	api_keys,
+	api_limits,
+	audio_concat_list_filename,
+	audio_delay_duration,
+	audio_filename,
+	audio_min_size,
+	audio_output_extension,
+	audio_single_pass,
+	audio_target_segment_duration,
+	audio_transition_duration,
+	batch_prompt,
+	batch_size,
+	build_state_filename,
+	concurrent_requests,
+	crop_manifest,
+	crop_manifest_filename,
+	crop_suffix_length,
+	debug_artifacts,
+	delay_suffix,
+	detection_server,
+	dirs,
+	fish_streaming,
+	fish_temperature,
+	height_range,
+	legacy_metadata_dirs,
+	margin,
+	max_distance,
+	max_tokens,
+	merged_durations_filename,
+	merged_gaps_filename,
+	metadata_filename,
+	model,
+	ocr_cache_filename,
+	output_image_extension,
+	pause,
+	prefix_length,
+	prompt,
+	reading_direction,
+	reference_audio,
+	reference_text,
+	register_reference,
+	retries,
+	sample_rate,
+	temperature,
+	temperature_step,
+	text_min_size,
+	tile_height,
+	tile_overlap,
+	total_duration_filename,
+	total_gaps_filename,
+	transition_suffix,
+	tts_chunk_size,
+	workers_config,
+):
+	pages = sorted(
 		[
 			f
-			for f in os.listdir(dirs["image_audio_resized"])
-			if f.lower().endswith(audio_output_extension)
+			for f in os.listdir(dirs["image_resized"])
+			if f.lower().endswith(output_image_extension)
 		]
 	)
-	create_audio_list(
-		audio_concat_list_filename,
-		final_audios,
-		dirs["image_audio_resized"],
-		dirs["merge"],
+	state_path = os.path.join(dirs["merge"], build_state_filename)
+	state = load_json_dict(state_path)
+	crops_parameters = get_crops_parameters(
+		crop_manifest,
+		crop_suffix_length,
+		height_range,
+		margin,
+		max_distance,
+		output_image_extension,
+		reading_direction,
+		tile_height,
+		tile_overlap,
 	)
-	render_audio(
-		audio_filename,
+	texts_parameters = get_texts_parameters(
+		batch_prompt, batch_size, max_tokens, model, prompt, temperature
+	)
+	fish_parameters = get_fish_parameters(
+		fish_temperature, max_tokens, reference_audio, reference_text
+	)
+	audio_parameters = get_audio_parameters(
+		sample_rate, audio_single_pass, audio_target_segment_duration
+	)
+	metadata_path = os.path.join(dirs["merge"], metadata_filename)
+	store = open_metadata_store(metadata_path)
+	import_legacy_metadata(legacy_metadata_dirs, store)
+	stale_pages = filter_stale_outputs(
+		functools.partial(has_metadata, store, "gaps"),
+		pages,
+		dirs["image_resized"],
+		crops_parameters,
+		state,
+		"crops",
+	)
+	stale_basenames = {os.path.splitext(f)[0] for f in stale_pages}
+	changed_pages = filter_changed(
+		stale_pages, dirs["image_resized"], crops_parameters, state, "crops"
+	)
+	remove_metadata(stale_pages, store, "gaps")
+	remove_outputs(stale_pages, dirs["image_regions"], ".json")
+	remove_page_outputs(
+		{os.path.splitext(f)[0] for f in changed_pages},
+		crop_suffix_length,
+		dirs,
+		store,
+	)
+	existing_crops = [
+		f
+		for f in list_crops(
+			crop_manifest, crop_manifest_filename, dirs, output_image_extension
+		)
+		if os.path.splitext(f)[0][:-crop_suffix_length] not in stale_basenames
+	]
+	crop_reader = CropReader(crop_manifest, crop_suffix_length, dirs)
+	reference_id = None
+	if register_reference:
+		reference_id = register_fish_reference(
+			api_endpoints[0], reference_audio, reference_text
+		)
+	workers = min(workers_config, cpu_count())
+	detect_results = []
+	text_results = []
+	tts_results = []
+	audio_results = []
+	rate_limiters = create_rate_limiters(
+		api_limits, max(concurrent_requests, workers)
+	)
+	init_rate_limiters(rate_limiters)
+	loop = asyncio.new_event_loop()
+	loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+	loop_thread.start()
+	cache = open_ocr_cache(os.path.join(dirs["merge"], ocr_cache_filename))
+	session, semaphore = asyncio.run_coroutine_threadsafe(
+		open_text_session(concurrent_requests), loop
+	).result()
+	errors = queue.Queue()
+	detect_pool = Pool(processes=workers)
+	tts_pool = Pool(
+		processes=workers, initializer=init_rate_limiters, initargs=(rate_limiters,)
+	)
+	audio_pool = Pool(processes=workers)
+	detection_address = None
+	try:
+		if detection_server and stale_pages:
+			detection_address, detection_process = start_detection_server()
+
+		def on_audio(audio_name):
+			if filter_stale_outputs(
+				functools.partial(has_metadata, store, "durations"),
+				[audio_name],
+				dirs["image_audio"],
+				audio_parameters,
+				state,
+				"audio",
+			):
+				args = (
+					audio_output_extension,
+					audio_name,
+					dirs["image_audio"],
+					metadata_path,
+					dirs["image_audio_resized"],
+					sample_rate,
+					audio_single_pass,
+					audio_target_segment_duration,
+				)
+				audio_results.append(
+					audio_pool.apply_async(set_audio_duration, args)
+				)
+
+		def on_text(crop):
+			basename = os.path.splitext(crop)[0]
+			text_name = f"{basename}.json"
+			audio_name = f"{basename}{audio_output_extension}"
+			text_path = os.path.join(dirs["image_text"], text_name)
+			if not is_valid_json(text_min_size, text_path):
+				on_audio(audio_name)
+				return
+			if not filter_stale(
+				[text_name],
+				dirs["image_text"],
+				dirs["image_audio"],
+				audio_output_extension,
+				fish_parameters,
+				state,
+				"fish_tts",
+			):
+				on_audio(audio_name)
+				return
+			remove_outputs([text_name], dirs["image_audio"], audio_output_extension)
+			args = (
+				api_endpoints[0],
+				0,
+				audio_output_extension,
+				dirs["tts_cache"],
+				tts_chunk_size,
+				text_name,
+				dirs["image_text"],
+				max_tokens,
+				audio_min_size,
+				dirs["image_audio"],
+				pause,
+				reference_audio,
+				reference_id,
+				reference_text,
+				retries,
+				fish_streaming,
+				fish_temperature,
+			)
+			tts_results.append(
+				tts_pool.apply_async(
+					fish_text_to_audio,
+					args,
+					callback=catch_errors(
+						errors, lambda _, name=audio_name: on_audio(name)
+					),
+				)
+			)
+
+		def on_texts(crops):
+			for crop in crops:
+				on_text(crop)
+
+		def on_crops(crops):
+			stale_crops = filter_stale(
+				crops,
+				dirs["image_crops"],
+				dirs["image_text"],
+				".json",
+				texts_parameters,
+				state,
+				"texts",
+			)
+			on_texts([crop for crop in crops if crop not in stale_crops])
+			remove_outputs(stale_crops, dirs["image_text"], ".json")
+			for group in group_crops(batch_size, crop_suffix_length, stale_crops):
+				coroutine = crops_to_text(
+					api_endpoints[2],
+					api_keys[1],
+					0,
+					batch_prompt,
+					cache,
+					crop_reader,
+					group,
+					max_tokens,
+					text_min_size,
+					model,
+					dirs["image_text"],
+					pause,
+					prompt,
+					retries,
+					semaphore,
+					session,
+					temperature,
+					temperature_step,
+				)
+				text_results.append(
+					asyncio.run_coroutine_threadsafe(
+						chain_coroutine(
+							catch_errors(errors, functools.partial(on_texts, group)),
+							coroutine,
+						),
+						loop,
+					)
+				)
+
+		def on_page(page, count):
+			basename = os.path.splitext(page)[0]
+			on_crops(
+				[
+					f"{basename}{i+1:0{crop_suffix_length}d}{output_image_extension}"
+					for i in range(count)
+				]
+			)
+
+		for page in stale_pages:
+			args = (
+				crop_manifest,
+				crop_suffix_length,
+				debug_artifacts,
+				detection_address,
+				page,
+				height_range,
+				dirs["image_resized"],
+				margin,
+				max_distance,
+				metadata_path,
+				dirs["image_boxed"],
+				dirs["image_crops"],
+				dirs["image_grouped"],
+				dirs["image_regions"],
+				output_image_extension,
+				reading_direction,
+				tile_height,
+				tile_overlap,
+			)
+			detect_results.append(
+				detect_pool.apply_async(
+					detect_page,
+					args,
+					callback=catch_errors(
+						errors, functools.partial(on_page, page)
+					),
+				)
+			)
+		on_crops(existing_crops)
+		for result in detect_results:
+			result.get()
+			raise_errors(errors)
+		detect_pool.close()
+		detect_pool.join()
+		for result in text_results:
+			result.result()
+			raise_errors(errors)
+		for results in (tts_results, audio_results):
+			for result in results:
+				result.get()
+				raise_errors(errors)
+	finally:
+		for pool in (detect_pool, tts_pool, audio_pool):
+			pool.terminate()
+		if detection_address:
+			stop_detection_server(detection_address, detection_process)
+		asyncio.run_coroutine_threadsafe(session.close(), loop).result()
+		loop.call_soon_threadsafe(loop.stop)
+		loop_thread.join()
+		loop.close()
+		cache.close()
+	if crop_manifest:
+		merge_regions_json(crop_manifest_filename, dirs["image_regions"], dirs["merge"])
+	crops_list = list_crops(
+		crop_manifest, crop_manifest_filename, dirs, output_image_extension
+	)
+	texts_list = sorted(
+		[f for f in os.listdir(dirs["image_text"]) if f.lower().endswith(".json")]
+	)
+	initial_audios = [
+		f.replace(output_image_extension, audio_output_extension) for f in crops_list
+	]
+	record_build_outputs(
+		functools.partial(has_metadata, store, "gaps"),
+		pages,
+		dirs["image_resized"],
+		crops_parameters,
+		state,
+		"crops",
+	)
+	record_build(
+		[
+			f
+			for f in crops_list
+			if is_valid_json(
+				text_min_size,
+				os.path.join(dirs["image_text"], f"{os.path.splitext(f)[0]}.json"),
+			)
+		],
+		dirs["image_crops"],
+		dirs["image_text"],
+		".json",
+		texts_parameters,
+		state,
+		"texts",
+	)
+	record_tts_build(
+		audio_min_size,
+		audio_output_extension,
+		dirs,
+		fish_parameters,
+		state,
+		"fish_tts",
+		texts_list,
+	)
+	record_build_outputs(
+		functools.partial(has_metadata, store, "durations"),
+		initial_audios,
+		dirs["image_audio"],
+		audio_parameters,
+		state,
+		"audio",
+	)
+	save_json_dict(state, state_path)
+	merge_gaps_json(merged_gaps_filename, dirs["merge"], store, total_gaps_filename)
+	finish_audio(
 		audio_concat_list_filename,
-		dirs["merge"],
-		dirs["render"],
+		audio_delay_duration,
+		audio_filename,
+		audio_output_extension,
+		audio_single_pass,
+		audio_transition_duration,
+		delay_suffix,
+		dirs,
+		initial_audios,
+		merged_durations_filename,
+		prefix_length,
 		sample_rate,
+		state,
+		state_path,
+		store,
+		total_duration_filename,
+		transition_suffix,
 	)
+	store.close()
 
 
 def resize_fit_image(
@@ -1583,41 +3973,62 @@ def resize_fit_image(
 	cv2.imwrite(output_path, image, [cv2.IMWRITE_JPEG_QUALITY, 100])
 
 
-def batch_resize_images_to_fit(
-	batch, input_dir, output_dir, output_image_extension, target_height
+def resize_to_fit(
+	build_state_filename, dirs, output_image_extension, target_height, workers_config
 ):
-	for filename in batch:
-		resize_fit_image(
-			filename, input_dir, output_dir, output_image_extension, target_height
-		)
-
-
-def resize_to_fit(dirs, output_image_extension, target_height, workers_config):
 	input_dir = dirs["image_resized"]
 	output_dir = dirs["image_resized_fit"]
 	images = sorted(
 		[f for f in os.listdir(input_dir) if f.lower().endswith(output_image_extension)]
 	)
-	workers = min(workers_config, cpu_count())
-	batches = split_batches(images, workers)
-	with Pool(processes=workers) as pool:
-		args = [
+	state_path = os.path.join(dirs["merge"], build_state_filename)
+	state = load_json_dict(state_path)
+	parameters = {
+		"output_image_extension": output_image_extension,
+		"target_height": target_height,
+	}
+	stale = filter_stale(
+		images,
+		input_dir,
+		output_dir,
+		output_image_extension,
+		parameters,
+		state,
+		"resize_to_fit",
+	)
+	if stale:
+		workers = min(workers_config, cpu_count())
+		tasks = [
 			(
-				batch,
-				input_dir,
-				output_dir,
-				output_image_extension,
-				target_height,
+				filename,
+				(
+					filename,
+					input_dir,
+					output_dir,
+					output_image_extension,
+					target_height,
+				),
 			)
-			for batch in batches
+			for filename in stale
 		]
-		pool.starmap_async(batch_resize_images_to_fit, args).get()
+		run_tasks(resize_fit_image, {}, "resize_to_fit", tasks, workers)
+	record_build(
+		images,
+		input_dir,
+		output_dir,
+		output_image_extension,
+		parameters,
+		state,
+		"resize_to_fit",
+	)
+	save_json_dict(state, state_path)
 
 
 def page_durations(
 	delay_suffix,
 	dirs,
-	merged_durations_filename,
+	legacy_metadata_dirs,
+	metadata_filename,
 	page_durations_filename,
 	prefix_length,
 	sum_suffix,
@@ -1625,10 +4036,11 @@ def page_durations(
 ):
 	input_dir = dirs["merge"]
 	output_dir = dirs["merge"]
-	input_path = os.path.join(input_dir, merged_durations_filename)
 	output_path = os.path.join(output_dir, page_durations_filename)
-	with open(input_path) as f:
-		durations = json.load(f)
+	store = open_metadata_store(os.path.join(input_dir, metadata_filename))
+	import_legacy_metadata(legacy_metadata_dirs, store)
+	durations = read_metadata(store, "durations")
+	store.close()
 	page_durations = {}
 	for key in durations.keys():
 		value = durations[key]
@@ -1710,6 +4122,7 @@ def render_media(audio_filename, media_filename, render_dir, video_filename):
 
 def fade(
 	audio_filename,
+	build_state_filename,
 	delay_suffix,
 	dirs,
 	fade_video_filename,
@@ -1730,6 +4143,21 @@ def fade(
 	path = os.path.join(merge_dir, page_durations_filename)
 	with open(path) as f:
 		page_durations = json.load(f)
+	state_path = os.path.join(merge_dir, build_state_filename)
+	state = load_json_dict(state_path)
+	input_paths = [os.path.join(input_dir, f) for f in os.listdir(input_dir)]
+	input_paths.append(os.path.join(render_dir, audio_filename))
+	output_paths = [
+		os.path.join(render_dir, fade_video_filename),
+		os.path.join(render_dir, media_filename),
+	]
+	parameters = {
+		"hold_duration": hold_duration,
+		"page_durations": page_durations,
+		"target_fps": target_fps,
+	}
+	if not is_step_stale(input_paths, output_paths, parameters, state, "fade"):
+		return
 	list_file_path = os.path.join(merge_dir, fade_video_list_filename)
 	keys = sorted(page_durations.keys())
 	with open(list_file_path, "w") as f:
@@ -1773,26 +4201,24 @@ def fade(
 		fade_video_filename, fade_video_list_filename, merge_dir, render_dir
 	)
 	render_media(audio_filename, media_filename, render_dir, fade_video_filename)
+	record_step(input_paths, parameters, state, "fade")
+	save_json_dict(state, state_path)
 
 
 def map_durations(
-	dirs, merged_durations_filename, merged_gaps_filename, transition_gaps_filename
+	dirs, legacy_metadata_dirs, metadata_filename, transition_gaps_filename
 ):
 	merge_dir = dirs["merge"]
-	durations_path = os.path.join(merge_dir, merged_durations_filename)
-	gaps_path = os.path.join(merge_dir, merged_gaps_filename)
 	output_path = os.path.join(merge_dir, transition_gaps_filename)
-	with open(durations_path) as f:
-		durations = json.load(f)
-	with open(gaps_path) as f:
-		gaps = json.load(f)
-	duration_keys = sorted(durations.keys())
-	gaps_keys = sorted(gaps.keys())
-	transition_gaps = {}
-	for i in range(len(duration_keys)):
-		duration_key = duration_keys[i]
-		gap_key = gaps_keys[i]
-		transition_gaps[duration_key] = gaps[gap_key]
+	store = open_metadata_store(os.path.join(merge_dir, metadata_filename))
+	import_legacy_metadata(legacy_metadata_dirs, store)
+	transition_gaps = dict(
+		store.execute(
+			"SELECT durations.key, gaps.value FROM durations"
+			" JOIN gaps ON gaps.key = durations.key"
+		).fetchall()
+	)
+	store.close()
 	with open(output_path, "w") as f:
 		json.dump(transition_gaps, f, indent="\t", ensure_ascii=False, sort_keys=True)
 
@@ -2031,6 +4457,7 @@ def process_scroll_segment(
 
 def scroll(
 	audio_filename,
+	build_state_filename,
 	delay_percent,
 	dirs,
 	hold_duration,
@@ -2062,6 +4489,22 @@ def scroll(
 	gap_keys = set(vertical_change_data.keys())
 	duration_keys = set(segment_duration_data.keys())
 	valid_segment_keys = sorted(list(gap_keys.intersection(duration_keys)), key=int)
+	state_path = os.path.join(merge_dir, build_state_filename)
+	state = load_json_dict(state_path)
+	input_paths = [meta["path"] for meta in image_metadata]
+	input_paths.append(os.path.join(render_dir, audio_filename))
+	output_paths = [output_video_path, os.path.join(render_dir, media_filename)]
+	parameters = {
+		"delay_percent": delay_percent,
+		"durations": segment_duration_data,
+		"gaps": vertical_change_data,
+		"hold_duration": hold_duration,
+		"target_fps": target_fps,
+		"target_height": target_height,
+		"target_width": target_width,
+	}
+	if not is_step_stale(input_paths, output_paths, parameters, state, "scroll"):
+		return
 	cached_image.cache_clear()
 	encoder_process = render_scroll_video(
 		target_height,
@@ -2124,3 +4567,5 @@ def scroll(
 		encoder_process.stdin.close()
 	_ = encoder_process.wait()
 	render_media(audio_filename, media_filename, render_dir, scroll_video_filename)
+	record_step(input_paths, parameters, state, "scroll")
+	save_json_dict(state, state_path)
@@ -9,6 +9,7 @@ from main import (
 	fish_tts,
 	openai_tts,
 	audio,
+	pipeline,
 	resize_to_fit,
 	page_durations,
 	fade,
@@ -19,6 +20,77 @@ import argparse
 import config
 
 
+def action_0(program_arguments):
+	overlapped = False
+	for action in config.PIPELINE_ACTIONS:
+		if action in OVERLAPPED_ACTIONS:
+			if not overlapped:
+				overlapped_actions()
+				overlapped = True
+			continue
+		program_arguments.action = action
+		start_processing(program_arguments)
+
+
+def overlapped_actions():
+	pipeline(
+		config.API_ENDPOINTS,
+		config.API_KEYS,
+		config.API_LIMITS,
+		config.AUDIO_CONCAT_LIST_FILENAME,
+		config.AUDIO_DELAY_DURATION,
+		config.AUDIO,
+		config.AUDIO_MIN_SIZE,
+		config.AUDIO_OUTPUT_EXTENSION,
+		config.AUDIO_SINGLE_PASS,
+		config.AUDIO_TARGET_SEGMENT_DURATION,
+		config.AUDIO_TRANSITION_DURATION,
+		config.BATCH_PROMPT,
+		config.BATCH_SIZE,
+		config.BUILD_STATE_FILENAME,
+		config.CONCURRENT_REQUESTS,
+		config.CROP_MANIFEST,
+		config.CROP_MANIFEST_FILENAME,
+		config.CROP_SUFFIX_LENGTH,
+		config.DEBUG_ARTIFACTS,
+		config.DELAY_SUFFIX,
+		config.DETECTION_SERVER,
+		config.DIRS,
+		config.FISH_STREAMING,
+		config.FISH_TEMPERATURE,
+		config.HEIGHT_RANGE,
+		config.LEGACY_METADATA_DIRS,
+		config.MARGIN,
+		config.MAX_DISTANCE,
+		config.MAX_TOKENS,
+		config.MERGED_DURATIONS_FILENAME,
+		config.MERGED_GAPS_FILENAME,
+		config.METADATA_FILENAME,
+		config.MODEL,
+		config.OCR_CACHE_FILENAME,
+		config.OUTPUT_IMAGE_EXTENSION,
+		config.PAUSE,
+		config.PREFIX_LENGTH,
+		config.PROMPT,
+		config.READING_DIRECTION,
+		config.REFERENCE_AUDIO,
+		config.REFERENCE_TEXT,
+		config.REGISTER_REFERENCE,
+		config.RETRIES,
+		config.SAMPLE_RATE,
+		config.TEMPERATURE,
+		config.TEMPERATURE_STEP,
+		config.TEXT_MIN_SIZE,
+		config.TILE_HEIGHT,
+		config.TILE_OVERLAP,
+		config.TOTAL_DURATION_FILENAME,
+		config.TOTAL_GAPS_FILENAME,
+		config.TRANSITION_SUFFIX,
+		config.TTS_CHUNK_SIZE,
+		config.WORKERS,
+	)
+
+
 def action_1():
 	initialize(config.DIRS)
 
@@ -30,19 +102,26 @@ def action_2(program_arguments):
 	prepare(
 		config.ARCHIVE_EXTENSIONS,
 		simulated_argv,
+		config.INGESTION_CHUNK_SIZE,
 		config.DIRS,
 		config.IMAGE_EXTENSIONS,
+		config.INGESTION_MANIFEST_FILENAME,
 		config.OUTPUT_FILENAME_LENGTH,
 		config.PREFIX_LENGTH,
 		config.SOURCE_PATHS,
+		config.STREAMING_INGESTION,
+		config.WORKERS,
 	)
 
 
 def action_3():
 	resize_to_width(
+		config.BUILD_STATE_FILENAME,
 		config.DIRS,
 		config.IMAGE_EXTENSIONS,
 		config.OUTPUT_IMAGE_EXTENSION,
+		config.REDUCED_DECODE,
+		config.RESIZE_QUALITY,
 		config.TARGET_WIDTH,
 		config.WORKERS,
 	)
@@ -62,13 +141,23 @@ def action_4(program_arguments):
 
 def action_5():
 	crops(
+		config.BUILD_STATE_FILENAME,
+		config.CROP_MANIFEST,
+		config.CROP_MANIFEST_FILENAME,
 		config.CROP_SUFFIX_LENGTH,
+		config.DEBUG_ARTIFACTS,
+		config.DETECTION_SERVER,
 		config.DIRS,
 		config.HEIGHT_RANGE,
+		config.LEGACY_METADATA_DIRS,
 		config.MARGIN,
 		config.MAX_DISTANCE,
 		config.MERGED_GAPS_FILENAME,
+		config.METADATA_FILENAME,
 		config.OUTPUT_IMAGE_EXTENSION,
+		config.READING_DIRECTION,
+		config.TILE_HEIGHT,
+		config.TILE_OVERLAP,
 		config.TOTAL_GAPS_FILENAME,
 		config.WORKERS,
 	)
@@ -78,10 +167,18 @@ def action_6():
 	texts(
 		config.API_ENDPOINTS,
 		config.API_KEYS,
+		config.API_LIMITS,
+		config.BATCH_PROMPT,
+		config.BATCH_SIZE,
+		config.BUILD_STATE_FILENAME,
 		config.CONCURRENT_REQUESTS,
+		config.CROP_MANIFEST,
+		config.CROP_MANIFEST_FILENAME,
+		config.CROP_SUFFIX_LENGTH,
 		config.DIRS,
 		config.MAX_TOKENS,
 		config.MODEL,
+		config.OCR_CACHE_FILENAME,
 		config.OUTPUT_IMAGE_EXTENSION,
 		config.PAUSE,
 		config.PROMPT,
@@ -94,6 +191,7 @@ def action_6():
 
 def action_7():
 	costs(
+		config.BATCH_SIZE,
 		config.COST_DEEPINFRA,
 		config.COST_FILENAME,
 		config.COST_GEMINI,
@@ -101,6 +199,9 @@ def action_7():
 		config.COST_OPENAI,
 		config.COST_OPENROUTER,
 		config.COST_TTS,
+		config.CROP_MANIFEST,
+		config.CROP_MANIFEST_FILENAME,
+		config.CROP_SUFFIX_LENGTH,
 		config.DIRS,
 		config.ENCODING_NAME,
 		config.MAX_TOKENS,
@@ -111,15 +212,20 @@ def action_7():
 def action_8():
 	fish_tts(
 		config.API_ENDPOINTS,
+		config.API_LIMITS,
 		config.AUDIO_MIN_SIZE,
 		config.AUDIO_OUTPUT_EXTENSION,
+		config.BUILD_STATE_FILENAME,
 		config.DIRS,
+		config.FISH_STREAMING,
 		config.FISH_TEMPERATURE,
 		config.MAX_TOKENS,
 		config.PAUSE,
 		config.REFERENCE_AUDIO,
 		config.REFERENCE_TEXT,
+		config.REGISTER_REFERENCE,
 		config.RETRIES,
+		config.TTS_CHUNK_SIZE,
 		config.WORKERS,
 	)
 
@@ -128,8 +234,10 @@ def action_9():
 	openai_tts(
 		config.API_ENDPOINTS,
 		config.API_KEYS,
+		config.API_LIMITS,
 		config.AUDIO_MIN_SIZE,
 		config.AUDIO_OUTPUT_EXTENSION,
+		config.BUILD_STATE_FILENAME,
 		config.DIRS,
 		config.INSTRUCTIONS,
 		config.MAX_TOKENS,
@@ -137,6 +245,7 @@ def action_9():
 		config.PAUSE,
 		config.RESPONSE_FORMAT,
 		config.RETRIES,
+		config.TTS_CHUNK_SIZE,
 		config.VOICES,
 		config.WORKERS,
 	)
@@ -147,12 +256,19 @@ def action_10():
 		config.AUDIO_CONCAT_LIST_FILENAME,
 		config.AUDIO_DELAY_DURATION,
 		config.AUDIO,
+		config.AUDIO_INDEX_FILENAME,
 		config.AUDIO_OUTPUT_EXTENSION,
+		config.AUDIO_SINGLE_PASS,
 		config.AUDIO_TARGET_SEGMENT_DURATION,
 		config.AUDIO_TRANSITION_DURATION,
+		config.BUILD_STATE_FILENAME,
+		config.CROP_MANIFEST,
+		config.CROP_MANIFEST_FILENAME,
 		config.DELAY_SUFFIX,
 		config.DIRS,
+		config.LEGACY_METADATA_DIRS,
 		config.MERGED_DURATIONS_FILENAME,
+		config.METADATA_FILENAME,
 		config.OUTPUT_IMAGE_EXTENSION,
 		config.PREFIX_LENGTH,
 		config.SAMPLE_RATE,
@@ -164,6 +280,7 @@ def action_10():
 
 def action_11():
 	resize_to_fit(
+		config.BUILD_STATE_FILENAME,
 		config.DIRS,
 		config.OUTPUT_IMAGE_EXTENSION,
 		config.TARGET_HEIGHT,
@@ -175,7 +292,8 @@ def action_12():
 	page_durations(
 		config.DELAY_SUFFIX,
 		config.DIRS,
-		config.MERGED_DURATIONS_FILENAME,
+		config.LEGACY_METADATA_DIRS,
+		config.METADATA_FILENAME,
 		config.PAGE_DURATIONS_FILENAME,
 		config.PREFIX_LENGTH,
 		config.SUM_SUFFIX,
@@ -186,6 +304,7 @@ def action_12():
 def action_13():
 	fade(
 		config.AUDIO,
+		config.BUILD_STATE_FILENAME,
 		config.DELAY_SUFFIX,
 		config.DIRS,
 		config.FADE_VIDEO,
@@ -204,8 +323,8 @@ def action_13():
 def action_14():
 	map_durations(
 		config.DIRS,
-		config.MERGED_DURATIONS_FILENAME,
-		config.MERGED_GAPS_FILENAME,
+		config.LEGACY_METADATA_DIRS,
+		config.METADATA_FILENAME,
 		config.TRANSITION_GAPS_FILENAME,
 	)
 
@@ -213,6 +332,7 @@ def action_14():
 def action_15():
 	scroll(
 		config.AUDIO,
+		config.BUILD_STATE_FILENAME,
 		config.DELAY_PERCENT,
 		config.DIRS,
 		config.VIDEO_HOLD_DURATION,
@@ -228,6 +348,7 @@ def action_15():
 
 
 ACTION_EXECUTORS = {
+	0: action_0,
 	1: action_1,
 	2: action_2,
 	3: action_3,
@@ -244,7 +365,8 @@ ACTION_EXECUTORS = {
 	14: action_14,
 	15: action_15,
 }
-ARGUMENT_REQUIRED_ACTIONS = {2, 4}
+ARGUMENT_REQUIRED_ACTIONS = {0, 2, 4}
+OVERLAPPED_ACTIONS = {5, 6, 8, 10}
 
 
 def start_processing(program_arguments):
@@ -296,6 +418,7 @@ if __name__ == "__main__":
 	)
 	parser.epilog = (
 		"Action descriptions:\n"
+		"  0: Execute all actions incrementally, overlapping 5, 6, 8 and 10.\n"
 		"  1: Prepare necessary directories.\n"
 		"  2: Prepare images from specified source (use --source PATH).\n"
 		"  3: Adjust image width.\n"